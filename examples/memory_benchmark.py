@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""
+Memory benchmark for the two representations of animals: one Fauna object
+per animal, and one row per animal in the columnar population store. The
+script prints the number of bytes needed per animal, including the list
+slot holding the object.
+"""
+
+__author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
+__email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
+
+import tracemalloc
+
+import numpy as np
+
+from biosim.fauna import Herbivore, Carnivore
+from biosim.population import Population
+
+
+def bytes_per_object(species_class, num_animals, rng):
+    """
+    Traced memory per animal of a list of Fauna objects.
+
+    Parameters
+    ----------
+    species_class: Herbivore or Carnivore class
+    num_animals: int
+    rng: numpy.random.Generator
+
+    Returns
+    -------
+    bytes per animal: float
+    """
+    tracemalloc.start()
+    animals = [species_class(age=5, weight=20.0, rng=rng)
+               for _ in range(num_animals)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del animals
+    return size / num_animals
+
+
+def bytes_per_row(num_animals):
+    """
+    Traced memory per animal of the columnar population store.
+
+    Parameters
+    ----------
+    num_animals: int
+
+    Returns
+    -------
+    bytes per animal: float
+    """
+    tracemalloc.start()
+    population = Population(1)
+    population['Herbivore'].append(np.full(num_animals, 5),
+                                   np.full(num_animals, 20.0),
+                                   np.zeros(num_animals, dtype=int))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del population
+    return size / num_animals
+
+
+if __name__ == '__main__':
+    num_animals = 200000
+    rng = np.random.default_rng(1)
+    for species_class in (Herbivore, Carnivore):
+        print('{:10} objects: {:6.1f} bytes per animal'.format(
+            species_class.__name__,
+            bytes_per_object(species_class, num_animals, rng)))
+    print('{:10} store:   {:6.1f} bytes per animal'.format(
+        'Herbivore', bytes_per_row(num_animals)))
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+"""
+Ensemble runner for Monte Carlo studies: the same island, initial population
+and parameters are simulated for many seeds. Every seed runs headless on the
+Map engine, without any graphics, and the seeds are spread over a process
+pool. Each seed gives the same trajectory as a BioSim simulation with that
+seed.
+
+Example
+-------
+::
+
+    result = run(island_map, ini_pop, seeds=range(100), years=50,
+                 params={'Herbivore': {'omega': 0.5}, 'J': {'f_max': 700}},
+                 workers=8)
+    result.counts.shape          # (100, 51, 2)
+    result.mean()                # (51, 2)
+    result.quantiles([0.05, 0.95])
+"""
+
+__author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
+__email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import numpy as np
+
+from .map import Map
+
+SPECIES = ('Herbivore', 'Carnivore')
+
+
+def apply_parameters(island, params):
+    """
+    Sets the given parameters on a map. Keys of params are species names,
+    for animal parameters, or landscape code letters, for landscape
+    parameters.
+
+    Parameters
+    ----------
+    island: Map
+    params: dict
+        Dictionary of parameter dictionaries, e.g.
+        {'Herbivore': {'F': 20.0}, 'S': {'alpha': 0.5}}
+    """
+    if params is None:
+        return
+    for key, values in params.items():
+        if key in SPECIES:
+            island.set_animal_parameters(key, values)
+        else:
+            island.set_landscape_parameters(key, values)
+
+
+def simulate_counts(island_map, ini_pop, seed, years, params=None):
+    """
+    Runs one headless simulation and records the number of animals per
+    species at the start and after every year.
+
+    Parameters
+    ----------
+    island_map: str
+    ini_pop: list
+        List of dictionaries specifying the initial population
+    seed: int
+    years: int
+    params: dict
+        Parameters as in apply_parameters
+
+    Returns
+    -------
+    counts: np.ndarray of int
+        Array of shape (years + 1, number of species)
+    """
+    island = Map(island_map, rng=np.random.default_rng(seed))
+    apply_parameters(island, params)
+    island.add_animals(ini_pop)
+    counts = np.empty((years + 1, len(SPECIES)), dtype=int)
+    counts[0] = [island.total_num_animals_per_species(species)
+                 for species in SPECIES]
+    for year in range(1, years + 1):
+        island.life_cycle()
+        counts[year] = [island.total_num_animals_per_species(species)
+                        for species in SPECIES]
+    return counts
+
+
+def _simulate_seed(task):
+    """
+    Process pool entry point, unpacks one task for simulate_counts.
+    """
+    return simulate_counts(*task)
+
+
+class EnsembleResult:
+    """
+    Animal counts of an ensemble of simulations, stacked as
+    (seed, year, species).
+    """
+
+    def __init__(self, seeds, counts):
+        """
+        The constructor for EnsembleResult class.
+
+        Parameters
+        ----------
+        seeds: list of int
+        counts: np.ndarray
+            Array of shape (number of seeds, years + 1, number of species)
+        """
+        self.seeds = list(seeds)
+        self.counts = counts
+        self.species = SPECIES
+        self.years = np.arange(counts.shape[1])
+
+    def species_counts(self, species):
+        """
+        Counts of one species for every seed and year.
+
+        Parameters
+        ----------
+        species: str
+
+        Returns
+        -------
+        counts: np.ndarray
+            Array of shape (number of seeds, years + 1)
+        """
+        return self.counts[:, :, self.species.index(species)]
+
+    def mean(self):
+        """
+        Mean count over the seeds for every year and species.
+
+        Returns
+        -------
+        mean: np.ndarray
+            Array of shape (years + 1, number of species)
+        """
+        return self.counts.mean(axis=0)
+
+    def quantiles(self, q=(0.05, 0.5, 0.95)):
+        """
+        Quantiles of the counts over the seeds for every year and species.
+
+        Parameters
+        ----------
+        q: float or sequence of float
+
+        Returns
+        -------
+        quantiles: np.ndarray
+            Array of shape (len(q), years + 1, number of species)
+        """
+        return np.quantile(self.counts, q, axis=0)
+
+
+def run(island_map, ini_pop, seeds, years, params=None, workers=None):
+    """
+    Simulates the island for every seed and collects the yearly animal
+    counts. The seeds are run in a pool of worker processes; with
+    workers=1 they run one after the other in the calling process.
+
+    Parameters
+    ----------
+    island_map: str
+    ini_pop: list
+        List of dictionaries specifying the initial population
+    seeds: iterable of int
+    years: int
+    params: dict
+        Parameters as in apply_parameters
+    workers: int
+        Number of worker processes, the number of CPUs if None
+
+    Returns
+    -------
+    result: EnsembleResult
+    """
+    seeds = list(seeds)
+    if len(seeds) == 0:
+        raise ValueError('At least one seed is needed')
+    if years < 0:
+        raise ValueError('Number of years can\'t be negative')
+    # fail early on an invalid island or invalid parameters
+    apply_parameters(Map(island_map), params)
+
+    tasks = [(island_map, ini_pop, seed, years, params) for seed in seeds]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        counts = [_simulate_seed(task) for task in tasks]
+    else:
+        chunksize = max(1, len(tasks) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            counts = list(executor.map(_simulate_seed, tasks,
+                                       chunksize=chunksize))
+    return EnsembleResult(seeds, np.stack(counts))
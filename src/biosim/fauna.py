@@ -15,17 +15,29 @@ from abc import ABC, abstractmethod
 import numpy as np
 import math
 
+from .parameters import ParameterSnapshot
+
 
 class Fauna(ABC):
     """
     Animal abstract superclass, inheriting from the (Abstract Base class) ABC,
     it has two subclasses which are animal species.
     Herbivores & Carnivores. The two subclasses feed in different ways.
+    The instances use __slots__ instead of a __dict__, so that an animal
+    only stores its age, weight, cached fitness, random number generator
+    and parameter snapshot.
+    The parameters are read from the snapshot of the species, which is
+    compiled from the parameters dictionary by set_given_parameters, unless
+    the animal was given its own snapshot, e.g. by a simulation with its own
+    parameters.
     """
     parameters = {}
+    snapshot = None
+    __slots__ = ('age', '_weight', '_fitness', '_rng', '_snapshot')
+    age_table_size = 200
 
     @abstractmethod
-    def __init__(self, age=None, weight=None):
+    def __init__(self, age=None, weight=None, rng=None, snapshot=None):
 
         """
         Constructor for superclass, if age or weight is initialised
@@ -37,9 +49,16 @@ class Fauna(ABC):
         ----------
         age: int
         weight: float, int
+        rng: numpy.random.Generator
+            Random number generator for all draws of the animal. If None,
+            the global numpy random functions are used.
+        snapshot: ParameterSnapshot
+            Parameters of the animal. If None, the animal follows the
+            snapshot of its species.
 
         """
-        np.random.seed(123456)
+        self._rng = np.random if rng is None else rng
+        self._snapshot = snapshot
         if age is None:
             self.age = 0
         else:
@@ -47,16 +66,12 @@ class Fauna(ABC):
             self.age = age
 
         if weight is None:
-            self._weight = self.set_default_weight()
+            self._weight = self.set_default_weight(self._rng, snapshot)
         else:
             self.raise_non_valid_attribute('Weight', weight)
             self._weight = weight
 
-        self.just_give_birth = False
-
         self._fitness = None
-        self.calculate_fitness()
-        self._recompute_fitness = False
 
     @property
     def weight(self):
@@ -78,15 +93,43 @@ class Fauna(ABC):
                              + attribute_name +
                              ', it has to be integer or float')
 
+    @property
+    def active_snapshot(self):
+        """
+        Parameter snapshot the animal reads its parameters from: its own
+        snapshot if it was given one, otherwise the snapshot of its species.
+
+        Returns
+        -------
+        snapshot: ParameterSnapshot
+        """
+        snapshot = self._snapshot
+        return self.snapshot if snapshot is None else snapshot
+
+    @active_snapshot.setter
+    def active_snapshot(self, snapshot):
+        self._snapshot = snapshot
+        self._fitness = None
+
     @classmethod
-    def set_default_weight(cls):
+    def set_default_weight(cls, rng=None, snapshot=None):
         """
         Sets default value for class attributes - age & weight of animal.
         Birth weight draws from gaussian distribution.
 
+        Parameters
+        ----------
+        rng: numpy.random.Generator
+            If None, the global numpy random functions are used.
+        snapshot: ParameterSnapshot
+            If None, the snapshot of the species is used.
+
         """
-        return np.random.normal(cls.parameters['w_birth'],
-                                cls.parameters['sigma_birth'])
+        if rng is None:
+            rng = np.random
+        if snapshot is None:
+            snapshot = cls.snapshot
+        return rng.normal(snapshot.w_birth, snapshot.sigma_birth)
 
     def grow_up(self):
         """
@@ -99,37 +142,87 @@ class Fauna(ABC):
         """
         Decreases weight of the animal every year by the factor 'eta'
         """
-        weight_to_reduce = self.weight * self.parameters['eta']
+        weight_to_reduce = self._weight * self.active_snapshot.eta
         self._weight -= weight_to_reduce
-        self._recompute_fitness = True
+        self._fitness = None
 
     @property
     def fitness(self):
         """
-        Getter with a flag variable reset to True when the fitness is
-        recalculated using the equation.
+        Getter of the cached fitness. The cache is reset to None whenever the
+        weight changes, and the fitness is then recalculated using the
+        equation.
+
         Returns
         -------
         fitness : float
 
         """
-        if self._recompute_fitness:
+        if self._fitness is None:
             self.calculate_fitness()
-            self._recompute_fitness = False
         return self._fitness
 
+    @classmethod
+    def build_age_table(cls, parameters):
+        """
+        Precomputes the age term of the fitness formula,
+        q1 = 1 / (1 + exp(phi_age * (age - a_half))), for the integer ages
+        0 to age_table_size - 1.
+
+        Parameters
+        ----------
+        parameters: dict
+
+        Returns
+        -------
+        age_table: np.ndarray
+        """
+        return 1 / (1 + np.exp(parameters['phi_age']
+                               * (np.arange(cls.age_table_size)
+                                  - parameters['a_half'])))
+
+    @classmethod
+    def compile_parameters(cls, parameters=None):
+        """
+        Builds the immutable snapshot of the species parameters. Besides the
+        parameters, the snapshot holds the derived constants
+        - birth_threshold: 'zeta' * ('w_birth' + 'sigma_birth'), the weight
+          an animal needs to give birth
+        - age_table and age_terms: the age term of the fitness formula for
+          integer ages, as array and as tuple
+
+        Parameters
+        ----------
+        parameters: dict
+            Parameters to compile, the class parameters if None
+
+        Returns
+        -------
+        snapshot: ParameterSnapshot
+        """
+        if parameters is None:
+            parameters = cls.parameters
+        age_table = cls.build_age_table(parameters)
+        return ParameterSnapshot(
+            parameters,
+            birth_threshold=parameters['zeta'] * (parameters['w_birth']
+                                                  + parameters['sigma_birth']),
+            age_table=age_table, age_terms=tuple(age_table.tolist()))
+
     @staticmethod
     def _fitness_formula(age, weight, parameters):
         """
         Computes fitness according to the formula:
         Phi = q(-1, a, a_half, phi_age)*q(+1, w, w_half, phi_weight)
         and always and always 0=< phi =< 1
+        When a parameter snapshot is given, the age term q1 is looked up in
+        its age table.
 
         Parameters
         ----------
         age: int
         weight: float
-        parameters: keys from the class dictionary parameters
+        parameters: ParameterSnapshot or dict
 
         Returns
         -------
@@ -137,23 +230,83 @@ class Fauna(ABC):
             Which is equal to fitness.
 
         """
-        q1 = 1 / (1 + math.exp((parameters['phi_age'])
-                               * (age - parameters['a_half'])))
+        if isinstance(parameters, ParameterSnapshot) and type(age) is int \
+                and 0 <= age < len(parameters.age_terms):
+            q1 = parameters.age_terms[age]
+        else:
+            q1 = 1 / (1 + math.exp((parameters['phi_age'])
+                                   * (age - parameters['a_half'])))
         q2 = 1 / (1 + math.exp((-1 * (parameters['phi_weight'])
                                 * (weight - parameters['w_half']))))
         return q1 * q2
 
+    @staticmethod
+    def batch_fitness(ages, weights, parameters):
+        """
+        Computes the fitness of many animals of one species in one pass,
+        with the same formula as _fitness_formula. Animals with weight zero
+        or less get fitness zero. When a parameter snapshot is given and
+        all ages are integers inside its age table, the age term is looked
+        up in the table.
+
+        Parameters
+        ----------
+        ages: np.ndarray
+        weights: np.ndarray
+        parameters: ParameterSnapshot or dict
+
+        Returns
+        -------
+        fitness: np.ndarray
+        """
+        ages = np.asarray(ages)
+        weights = np.asarray(weights, dtype=float)
+        if isinstance(parameters, ParameterSnapshot) \
+                and ages.dtype.kind in 'iu' \
+                and (ages.size == 0
+                     or (ages.min() >= 0
+                         and ages.max() < len(parameters.age_table))):
+            q1 = parameters.age_table[ages]
+        else:
+            q1 = 1 / (1 + np.exp(parameters['phi_age']
+                                 * (ages - parameters['a_half'])))
+        q2 = 1 / (1 + np.exp(-1 * parameters['phi_weight']
+                             * (weights - parameters['w_half'])))
+        return np.where(weights > 0, q1 * q2, 0.0)
+
+    @classmethod
+    def update_fitness_batch(cls, animals):
+        """
+        Recomputes the fitness of a list of animals of this species at once
+        and stores it on the animal objects. The animals are expected to
+        share the parameter snapshot of the first animal.
+
+        Parameters
+        ----------
+        animals: list of Fauna objects
+        """
+        if len(animals) == 0:
+            return
+        ages = np.array([animal.age for animal in animals])
+        weights = np.fromiter((animal.weight for animal in animals),
+                              dtype=float, count=len(animals))
+        fitness = cls.batch_fitness(ages, weights,
+                                    animals[0].active_snapshot)
+        for animal, animal_fitness in zip(animals, fitness.tolist()):
+            animal._fitness = animal_fitness
+
     def calculate_fitness(self):
         """
-        Controls condition when weight is zero. Otherwise, calculate animal
-        fitness which is based on age & weight of the animal.
+        Controls condition when weight is zero or negative. Otherwise,
+        calculate animal fitness which is based on age & weight of the animal.
 
         """
-        if self.weight == 0:
+        weight = self._weight
+        if weight <= 0:
             self._fitness = 0
         else:
-            self._fitness = self._fitness_formula(
-                self.age, self.weight, self.parameters)
+            self._fitness = self._fitness_formula(self.age, weight,
+                                                  self.active_snapshot)
 
     @property
     def move_prob(self):
@@ -165,8 +318,8 @@ class Fauna(ABC):
         animal movement probability: boolean
 
         """
-        move_probability = self.parameters['mu'] * self._fitness
-        return move_probability > np.random.random()
+        move_probability = self.active_snapshot.mu * self.fitness
+        return move_probability > self._rng.random()
 
     def birth_prob(self, num_fauna):
         """
@@ -187,16 +340,53 @@ class Fauna(ABC):
         birth probability: bool
 
         """
-        zeta = self.parameters['zeta']
-        w_birth = self.parameters['w_birth']
-        sigma_birth = self.parameters['sigma_birth']
-        if num_fauna >= 2 and self.weight >= zeta * (w_birth + sigma_birth):
-            gamma = self.parameters['gamma']
-            return np.random.random() < min(1, gamma *
-                                            self._fitness * (num_fauna - 1))
+        snapshot = self.active_snapshot
+        if num_fauna >= 2 and self._weight >= snapshot.birth_threshold:
+            return self._rng.random() < min(1, snapshot.gamma *
+                                            self.fitness * (num_fauna - 1))
         else:
             return False
 
+    @staticmethod
+    def give_birth_batch(weights, fitness, num_fauna, parameters, rng):
+        """
+        Birth decisions for many potential mothers at once, with the rules
+        of birth_prob and lose_weight_give_birth: a mother needs at least
+        zeta * (w_birth + sigma_birth) weight and gives birth with
+        probability min(1, gamma * fitness * (num_fauna - 1)). All baby
+        weights are drawn with one gaussian draw, and a birth only happens
+        if the mother weighs at least 'xi' times the baby weight. The weight
+        limit is the birth_threshold compiled into the snapshot.
+
+        Parameters
+        ----------
+        weights: np.ndarray
+            Weights of the potential mothers
+        fitness: np.ndarray
+            Fitness of the potential mothers
+        num_fauna: int or np.ndarray
+            Number of animals of the species in each mother's cell
+        parameters: ParameterSnapshot
+        rng: numpy.random.Generator
+
+        Returns
+        -------
+        mothers: np.ndarray of int
+            Indices of the animals that gave birth
+        baby_weights: np.ndarray
+            Birth weight of the baby of each mother
+        """
+        num_fauna = np.broadcast_to(num_fauna, np.shape(weights))
+        candidates = np.flatnonzero(
+            (num_fauna >= 2) & (weights >= parameters.birth_threshold))
+        birth_prob = np.minimum(1, parameters.gamma * fitness[candidates]
+                                * (num_fauna[candidates] - 1))
+        mothers = candidates[rng.random(len(candidates)) < birth_prob]
+        baby_weights = rng.normal(parameters.w_birth, parameters.sigma_birth,
+                                  len(mothers))
+        can_give_birth = weights[mothers] >= baby_weights * parameters.xi
+        return mothers[can_give_birth], baby_weights[can_give_birth]
+
     def lose_weight_give_birth(self, baby):
         """
         Decreases mother animal weight 'xi' times of the actual birth weight of
@@ -207,11 +397,18 @@ class Fauna(ABC):
         baby: obj
             An object of any Fauna subclasses, either Carnivores or Herbivores
             based on mother's species
+
+        Returns
+        -------
+        gave birth: bool
+            True if the mother was heavy enough to give birth
         """
-        if self.weight >= baby.weight * baby.parameters['xi']:
-            self._weight -= baby.weight * baby.parameters['xi']
-            self.just_give_birth = True
-        self._recompute_fitness = False
+        weight_to_reduce = baby.weight * baby.active_snapshot.xi
+        if self._weight < weight_to_reduce:
+            return False
+        self._weight -= weight_to_reduce
+        self._fitness = None
+        return True
 
     @property
     def death_prob(self):
@@ -224,11 +421,32 @@ class Fauna(ABC):
         death probability: bool
 
         """
-        if self._fitness == 0:
+        fitness = self.fitness
+        if fitness == 0:
             return True
         else:
-            return np.random.random() < self.parameters['omega'] \
-                   * (1 - self._fitness)
+            return self._rng.random() < self.active_snapshot.omega \
+                * (1 - fitness)
+
+    @staticmethod
+    def die_batch(fitness, parameters, rng):
+        """
+        Death decisions for many animals at once with the rule of
+        death_prob: animals with zero fitness die, the others die with
+        probability 'omega' * (1 - fitness).
+
+        Parameters
+        ----------
+        fitness: np.ndarray
+        parameters: ParameterSnapshot
+        rng: numpy.random.Generator
+
+        Returns
+        -------
+        dies: np.ndarray of bool
+        """
+        return (fitness == 0) | (rng.random(len(fitness)) <
+                                 parameters.omega * (1 - fitness))
 
     def eat(self, amount_to_eat):
         """
@@ -239,23 +457,32 @@ class Fauna(ABC):
         amount_to_eat: int, float
 
         """
-        self._weight += self.parameters['beta'] * amount_to_eat
-        self._recompute_fitness = False
+        self._weight += self.active_snapshot.beta * amount_to_eat
+        self._fitness = None
 
     @classmethod
-    def set_given_parameters(cls, params):
+    def updated_parameters(cls, params, parameters=None):
         """
-        save the user defined parameter value for Carnivore and Herbivore
-        inside the class variables parameters.
+        Checks the user defined parameter values and returns a copy of the
+        parameters updated with them. The parameters themselves are not
+        changed.
 
         Parameters
         ----------
         params: dict
+            User defined parameter values
+        parameters: dict
+            Parameters to update, the class parameters if None
 
+        Returns
+        -------
+        parameters: dict
         """
-
+        if parameters is None:
+            parameters = cls.parameters
+        updated = dict(parameters)
         for parameter in params:
-            if parameter in cls.parameters:
+            if parameter in parameters:
                 if parameter == 'eta' and params['eta'] > 1:
                     raise ValueError('Illegal parameter value, eta '
                                      'can\'t be more than 1')
@@ -266,19 +493,36 @@ class Fauna(ABC):
                     raise ValueError('Illegal parameter value, ' +
                                      str(parameter) + ' can\'t be negative')
                 else:
-                    cls.parameters[parameter] = params[parameter]
+                    updated[parameter] = params[parameter]
             else:
                 raise RuntimeError('Unknown parameter, ' + str(parameter) +
                                    ' can\'t be set')
+        return updated
+
+    @classmethod
+    def set_given_parameters(cls, params):
+        """
+        save the user defined parameter value for Carnivore and Herbivore
+        inside the class variables parameters, and compiles the new
+        parameter snapshot of the species.
+
+        Parameters
+        ----------
+        params: dict
+
+        """
+        cls.parameters.update(cls.updated_parameters(params))
+        cls.snapshot = cls.compile_parameters()
 
 
 class Herbivore(Fauna):
+    __slots__ = ()
     parameters = {'eta': 0.05, 'F': 10.0, 'beta': 0.9, 'w_birth': 8.0,
                   'sigma_birth': 1.5, 'phi_age': 0.2, 'phi_weight': 0.1,
                   'a_half': 40, 'w_half': 10.0, 'gamma': 0.8, 'zeta': 3.5,
                   'xi': 1.2, 'mu': 0.25, 'lambda': 1.0, 'omega': 0.4}
 
-    def __init__(self, age=None, weight=None):
+    def __init__(self, age=None, weight=None, rng=None, snapshot=None):
         """
         subclass of Fauna class.
 
@@ -286,19 +530,22 @@ class Herbivore(Fauna):
         ----------
         age: int
         weight: float
+        rng: numpy.random.Generator
+        snapshot: ParameterSnapshot
 
         """
-        super().__init__(age, weight)
+        super().__init__(age, weight, rng, snapshot)
 
 
 class Carnivore(Fauna):
+    __slots__ = ()
     parameters = {'eta': 0.125, 'F': 50.0, 'beta': 0.75, 'w_birth': 6.0,
                   'sigma_birth': 1.0, 'phi_age': 0.4, 'phi_weight': 0.4,
                   'a_half': 60, 'w_half': 4.0, 'gamma': 0.8, 'zeta': 3.5,
                   'xi': 1.1, 'mu': 0.4, 'DeltaPhiMax': 10.0, 'lambda': 1.0,
                   'omega': 0.9}
 
-    def __init__(self, age=None, weight=None):
+    def __init__(self, age=None, weight=None, rng=None, snapshot=None):
         """
         subclass of Fauna class.
 
@@ -306,9 +553,10 @@ class Carnivore(Fauna):
         ----------
         age: int
         weight: float
+        rng: numpy.random.Generator
+        snapshot: ParameterSnapshot
         """
-        super().__init__(age, weight)
-        self._kill_prob = None
+        super().__init__(age, weight, rng, snapshot)
 
     def kill_prob(self, herbivore_to_kill):
         """
@@ -329,14 +577,35 @@ class Carnivore(Fauna):
 
         Returns
         -------
-        _kill_prob: bool
-        """
-        if self._fitness <= herbivore_to_kill.fitness:
-            self._kill_prob = 0
-        elif 0 < self.fitness - herbivore_to_kill.fitness < \
-                self.parameters['DeltaPhiMax']:
-            self._kill_prob = (self.fitness - herbivore_to_kill.fitness) / \
-                              self.parameters['DeltaPhiMax']
-        else:
-            self._kill_prob = 1
-        return np.random.random() < self._kill_prob
+        kill probability: bool
+        """
+        kill_probability = self.kill_probability(
+            self.fitness, herbivore_to_kill.fitness,
+            self.active_snapshot.DeltaPhiMax)
+        return self._rng.random() < kill_probability
+
+    @staticmethod
+    def kill_probability(carnivore_fitness, herbivore_fitness,
+                         delta_phi_max):
+        """
+        Kill probability of a carnivore against one or many herbivores at
+        once, following the rules of kill_prob: zero if the herbivore is at
+        least as fit, (carnivore fitness - herbivore fitness) / 'DeltaPhiMax'
+        if the difference is less than 'DeltaPhiMax', otherwise one.
+
+        Parameters
+        ----------
+        carnivore_fitness: float
+        herbivore_fitness: float or np.ndarray
+        delta_phi_max: float
+
+        Returns
+        -------
+        kill probability: float or np.ndarray
+        """
+        return np.clip((carnivore_fitness - herbivore_fitness)
+                       / delta_phi_max, 0, 1)
+
+
+Herbivore.snapshot = Herbivore.compile_parameters()
+Carnivore.snapshot = Carnivore.compile_parameters()
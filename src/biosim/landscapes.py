@@ -14,18 +14,100 @@ import operator
 import math
 import numpy as np
 
+from .fauna import Carnivore
+from .parameters import ParameterSnapshot
+
 
 class Landscape(ABC):
     """
     Landscape abstract class. It has five subclasses: Jungle, Desert,
     Savannah, Ocean, Mountain inherited from this base class.
+    The parameters are read from the snapshot of the landscape type, which
+    is compiled from the parameters dictionary by set_given_parameters,
+    unless the cell was given its own snapshot.
     """
     parameters = {}
+    snapshot = ParameterSnapshot({})
 
     @abstractmethod
-    def __init__(self):
+    def __init__(self, rng=None, snapshot=None):
+        """
+        Parameters
+        ----------
+        rng: numpy.random.Generator
+            Random number generator for the draws of the cell. If None, the
+            global numpy random functions are used.
+        snapshot: ParameterSnapshot
+            Parameters of the cell. If None, the cell follows the snapshot
+            of its landscape type.
+        """
+        self._rng = np.random if rng is None else rng
+        self._snapshot = snapshot
         self.in_cell_fauna = {'Herbivore': [], 'Carnivore': []}
         self.adult_fauna = {'Herbivore': [], 'Carnivore': []}
+        self.fodder = self.initial_fodder(snapshot)
+        self._herb_weight = 0
+        self._removed = {'Herbivore': set(), 'Carnivore': set()}
+
+    @property
+    def active_snapshot(self):
+        """
+        Parameter snapshot the cell reads its parameters from: its own
+        snapshot if it was given one, otherwise the snapshot of its
+        landscape type.
+        Returns
+        -------
+        snapshot: ParameterSnapshot
+        """
+        return self.snapshot if self._snapshot is None else self._snapshot
+
+    @active_snapshot.setter
+    def active_snapshot(self, snapshot):
+        self._snapshot = snapshot
+
+    @classmethod
+    def initial_fodder(cls, snapshot=None):
+        """
+        Amount of herbivore fodder in a new cell of this landscape.
+        Parameters
+        ----------
+        snapshot: ParameterSnapshot
+            If None, the snapshot of the landscape type is used.
+        Returns
+        -------
+        fodder: float
+        """
+        return 0
+
+    @classmethod
+    def grow_fodder(cls, fodder, snapshot=None):
+        """
+        Returns the herbivore fodder after the yearly growth. Works both on a
+        single amount and on an array of amounts of many cells.
+        Parameters
+        ----------
+        fodder: float or np.ndarray
+        snapshot: ParameterSnapshot
+            If None, the snapshot of the landscape type is used.
+        Returns
+        -------
+        fodder: float or np.ndarray
+        """
+        return fodder * 0
+
+    def update_fitness_animals(self, species=None):
+        """
+        Recomputes the fitness of all animals of the given species (or of
+        all species) in the cell in one batch, after weight or age changed.
+        Parameters
+        ----------
+        species: str
+        """
+        species_list = self.in_cell_fauna if species is None else [species]
+        for species_name in species_list:
+            animals = self.in_cell_fauna[species_name]
+            if len(animals) > 0:
+                animals[0].update_fitness_batch(animals)
 
     def sort_by_fitness(self):
         """
@@ -48,8 +130,12 @@ class Landscape(ABC):
         available_fodder[species]: float
             Available fodder (f_k) regarding the animal species of cell k
         """
-        species = animal.__class__.__name__
-        return self.available_fodder[species]
+        if not self.is_accessible:
+            return 0
+        elif animal.__class__.__name__ == 'Herbivore':
+            return self.fodder
+        else:
+            return self._herb_weight
 
     def relative_abundance_fodder(self, animal):
         """
@@ -66,8 +152,7 @@ class Landscape(ABC):
         """
         species = animal.__class__.__name__
         return self.relevant_fodder(animal) / (
-                (len(self.in_cell_fauna[species]) + 1)
-                * animal.parameters['F'])
+                (self.num_animals(species) + 1) * animal.active_snapshot.F)
 
     def propensity(self, animal):
         """
@@ -88,7 +173,7 @@ class Landscape(ABC):
         else:
             relevant_abun_fodder = self.relative_abundance_fodder(animal)
             return math.exp(relevant_abun_fodder *
-                            animal.parameters['lambda'])
+                            animal.active_snapshot.lambda_)
 
     def probability(self, animal, total_propensity):
         """
@@ -114,6 +199,8 @@ class Landscape(ABC):
 
         key = animal.__class__.__name__
         self.in_cell_fauna[key].append(animal)
+        if key == 'Herbivore':
+            self._herb_weight += animal.weight
 
     def remove_animal(self, animal):
         """
@@ -122,8 +209,46 @@ class Landscape(ABC):
         ----------
         animal: Carnivore or Herbivore object
         """
+        self._mark_removed(animal)
+        self._compact_fauna()
+
+    def _mark_removed(self, animal):
+        """
+        Records the animal as removed from the cell in O(1). The animal stays
+        in the list until _compact_fauna is called, so stages can keep
+        iterating over the lists without skipping animals.
+        Parameters
+        ----------
+        animal: Carnivore or Herbivore object
+        """
         species = animal.__class__.__name__
-        self.in_cell_fauna[species].remove(animal)
+        self._removed[species].add(id(animal))
+        if species == 'Herbivore':
+            self._herb_weight -= animal.weight
+
+    def _compact_fauna(self):
+        """
+        Removes all marked animals from the lists in one pass per species.
+        """
+        for species, removed in self._removed.items():
+            if len(removed) > 0:
+                animals = self.in_cell_fauna[species]
+                animals[:] = [animal for animal in animals
+                              if id(animal) not in removed]
+                removed.clear()
+
+    def num_animals(self, species):
+        """
+        Number of animals of the given species in the cell, without the ones
+        waiting to be removed.
+        Parameters
+        ----------
+        species: str
+        Returns
+        -------
+        number of animals: int
+        """
+        return len(self.in_cell_fauna[species]) - len(self._removed[species])
 
     @property
     def cell_fauna_count(self):
@@ -134,14 +259,14 @@ class Landscape(ABC):
         -------
         dictionary of animal with species keys
         """
-        herbivore = len(self.in_cell_fauna['Herbivore'])
-        carnivore = len(self.in_cell_fauna['Carnivore'])
+        herbivore = self.num_animals('Herbivore')
+        carnivore = self.num_animals('Carnivore')
         return {'Herbivore': herbivore, 'Carnivore': carnivore}
 
     def _feed_herbivore(self):
         """
-        Herbivores with the highest fitness eat first, "sorted_fauna_fitness"
-         dictionary is reverse sorted .
+        Herbivores with the highest fitness eat first, so the herbivores
+        sorted by "sort_by_fitness" are fed in reverse order.
         Every time a herbivore eats, the animal can eat fodder as the following
         "eating rules":
         - If available fodder is more than 'F', the animal eats 'F' and the
@@ -151,20 +276,59 @@ class Landscape(ABC):
         - If there is no fodder, the animal receives no food.
         """
         self.sort_by_fitness()
-        herbi_animals = np.array(self.in_cell_fauna['Herbivore'])
-        for herbivore in herbi_animals:
-            herb_available_fodder = self.available_fodder['Herbivore']
-            appetite = herbivore.parameters['F']
-            if herb_available_fodder == 0:
+        herbi_animals = self.in_cell_fauna['Herbivore'][::-1]
+        if len(herbi_animals) == 0:
+            return
+        appetite = herbi_animals[0].active_snapshot.F
+        portions = self.herbivore_portions(
+            self.fodder, np.arange(len(herbi_animals)), appetite)
+        for herbivore, amount_to_eat in zip(herbi_animals, portions.tolist()):
+            if amount_to_eat == 0:
                 # break the loop to save computation
                 break
-            elif herb_available_fodder >= appetite:
-                herbivore.eat(appetite)
-                self.available_fodder['Herbivore'] -= appetite
-            elif 0 < herb_available_fodder < appetite:
-                amount_to_eat = self.available_fodder['Herbivore']
-                herbivore.eat(amount_to_eat)
-                self.available_fodder['Herbivore'] = 0
+            weight_before = herbivore.weight
+            herbivore.eat(amount_to_eat)
+            self._herb_weight += herbivore.weight - weight_before
+        self.fodder = self.fodder_left(self.fodder, len(herbi_animals),
+                                       appetite)
+
+    @staticmethod
+    def herbivore_portions(fodder, rank, appetite):
+        """
+        Amount of fodder eaten by herbivores that eat one after the other
+        following the eating rules. The herbivore with eating rank r finds
+        the fodder left by the r herbivores before it, fodder - r * 'F', and
+        eats 'F', what is left, or nothing. Works on arrays, so the
+        herbivores of many cells can be fed at once when fodder holds the
+        fodder of each herbivore's cell and rank its rank inside the cell.
+        Parameters
+        ----------
+        fodder: float or np.ndarray
+            Fodder of the cell before feeding
+        rank: np.ndarray of int
+            Eating order of the herbivores inside their cell
+        appetite: float
+            Parameter 'F' of herbivores
+        Returns
+        -------
+        portions: np.ndarray
+        """
+        return np.clip(fodder - rank * appetite, 0, appetite)
+
+    @staticmethod
+    def fodder_left(fodder, num_herbivores, appetite):
+        """
+        Fodder left in a cell after num_herbivores herbivores have eaten.
+        Parameters
+        ----------
+        fodder: float or np.ndarray
+        num_herbivores: int or np.ndarray
+        appetite: float
+        Returns
+        -------
+        fodder: float or np.ndarray
+        """
+        return np.maximum(fodder - num_herbivores * appetite, 0)
 
     def _feed_carnivore(self):
         """
@@ -178,23 +342,72 @@ class Landscape(ABC):
         """
         self.sort_by_fitness()
         carni_animals = self.in_cell_fauna['Carnivore']
-        for carnivore in carni_animals:
-            appetite = carnivore.parameters['F']
-            amount_to_eat = 0
-            dead_animals = []
-            herbi_animals = np.array(self.in_cell_fauna['Herbivore'])
-            for herbivore in herbi_animals:
-                if appetite <= amount_to_eat:
-                    break
-                elif carnivore.kill_prob(herbivore):
-                    if appetite - amount_to_eat < herbivore.weight:
-                        amount_to_eat += herbivore.weight
-                    elif appetite - amount_to_eat < herbivore.weight:
-                        amount_to_eat += appetite - amount_to_eat
-                dead_animals.append(herbivore)
-            carnivore.eat(amount_to_eat)
-            for herbivore in dead_animals:
-                self.in_cell_fauna['Herbivore'].remove(herbivore)
+        herbi_animals = self.in_cell_fauna['Herbivore']
+        if len(carni_animals) == 0 or len(herbi_animals) == 0:
+            return
+        params = carni_animals[0].active_snapshot
+        carn_fitness = np.array([carn.fitness for carn in carni_animals])
+        herb_fitness = np.array([herb.fitness for herb in herbi_animals])
+        herb_weight = np.array([herb.weight for herb in herbi_animals])
+        eaten, killed = self.predation(carn_fitness, herb_fitness,
+                                       herb_weight, params.F,
+                                       params.DeltaPhiMax, self._rng)
+        for carnivore, amount_to_eat in zip(carni_animals, eaten.tolist()):
+            if amount_to_eat > 0:
+                carnivore.eat(amount_to_eat)
+        for i in np.flatnonzero(killed):
+            self._mark_removed(herbi_animals[i])
+        self._compact_fauna()
+
+    @staticmethod
+    def predation(carn_fitness, herb_fitness, herb_weight, appetite,
+                  delta_phi_max, rng):
+        """
+        Predation kernel of one cell working on arrays. The carnivores hunt
+        one after the other in the given order and try the remaining
+        herbivores in the given order. For each carnivore the kill
+        probability against all remaining herbivores is evaluated at once,
+        with one block of random numbers. The carnivore stops after the kill
+        that brings the eaten weight to 'F'; of that last herbivore it only
+        eats what is left of its appetite.
+        Parameters
+        ----------
+        carn_fitness: np.ndarray
+            Fitness of the carnivores, in hunting order
+        herb_fitness: np.ndarray
+            Fitness of the herbivores, in the order they are tried
+        herb_weight: np.ndarray
+            Weight of the herbivores, in the same order
+        appetite: float
+            Parameter 'F' of carnivores
+        delta_phi_max: float
+        rng: numpy.random.Generator
+        Returns
+        -------
+        eaten: np.ndarray
+            Amount eaten by each carnivore
+        killed: np.ndarray of bool
+            True for the herbivores that were killed
+        """
+        eaten = np.zeros(len(carn_fitness))
+        killed = np.zeros(len(herb_fitness), dtype=bool)
+        alive = np.arange(len(herb_fitness))
+        for j, fitness in enumerate(carn_fitness):
+            if len(alive) == 0:
+                break
+            kill_prob = Carnivore.kill_probability(
+                fitness, herb_fitness[alive], delta_phi_max)
+            if not np.any(kill_prob > 0):
+                continue
+            victims = alive[rng.random(len(alive)) < kill_prob]
+            cum_weight = np.cumsum(herb_weight[victims])
+            num_victims = np.searchsorted(cum_weight, appetite) + 1
+            victims = victims[:num_victims]
+            if len(victims) > 0:
+                eaten[j] = min(cum_weight[len(victims) - 1], appetite)
+                killed[victims] = True
+                alive = alive[~killed[alive]]
+        return eaten, killed
 
     def feed_animals(self):
         """
@@ -203,10 +416,15 @@ class Landscape(ABC):
         """
         self._grow_herb_fodder()
         self._feed_herbivore()
+        self.update_fitness_animals('Herbivore')
         self._feed_carnivore()
+        self.update_fitness_animals('Carnivore')
 
     def _grow_herb_fodder(self):
-        pass
+        """
+        Grows the herbivore fodder of the cell for the new year.
+        """
+        self.fodder = self.grow_fodder(self.fodder, self._snapshot)
 
     def grow_up_animals(self):
         """
@@ -216,6 +434,7 @@ class Landscape(ABC):
         for species in self.in_cell_fauna:
             for animal in self.in_cell_fauna[species]:
                 animal.grow_up()
+        self.update_fitness_animals()
 
     def lose_weight_animals(self):
         """
@@ -224,7 +443,11 @@ class Landscape(ABC):
         """
         for species in self.in_cell_fauna:
             for animal in self.in_cell_fauna[species]:
+                weight_before = animal.weight
                 animal.lose_weight()
+                if species == 'Herbivore':
+                    self._herb_weight += animal.weight - weight_before
+        self.update_fitness_animals()
 
     def die_animals(self):
         """
@@ -236,7 +459,8 @@ class Landscape(ABC):
         for species, animals in current_animals.items():
             for animal in animals:
                 if animal.death_prob:
-                    self.remove_animal(animal)
+                    self._mark_removed(animal)
+        self._compact_fauna()
 
     def give_birth_animals(self):
         """
@@ -248,20 +472,26 @@ class Landscape(ABC):
         in the first year of the cycle. But added to the adult animals for the
         next year
         """
-        adult_fauna = self.in_cell_fauna
-        for species, animals in adult_fauna.items():
-            half_num_fauna = math.floor(len(adult_fauna[species]) / 2)
-            # half of the animals will give birth of adult animals
-            for i in range(half_num_fauna):
-                animal = animals[i]
-                # only iterate through the first half of the animal list
-                if animal.birth_prob(len(animals)):
-                    baby_species = animal.__class__
-                    baby = baby_species()
-                    animal.lose_weight_give_birth(baby)
-                    if animal.just_give_birth:
-                        self.in_cell_fauna[species].append(baby)
-                        animal.just_give_birth = False
+        for species, animals in self.in_cell_fauna.items():
+            # only the first half of the animal list may give birth
+            parents = animals[:math.floor(len(animals) / 2)]
+            if len(parents) == 0:
+                continue
+            species_class = parents[0].__class__
+            mothers, baby_weights = species_class.give_birth_batch(
+                np.array([animal.weight for animal in parents]),
+                np.array([animal.fitness for animal in parents]),
+                len(animals), parents[0].active_snapshot, self._rng)
+            for i, baby_weight in zip(mothers.tolist(), baby_weights.tolist()):
+                mother = parents[i]
+                baby = species_class(weight=baby_weight, rng=self._rng,
+                                     snapshot=mother._snapshot)
+                weight_before = mother.weight
+                mother.lose_weight_give_birth(baby)
+                self.add_animal(baby)
+                if species == 'Herbivore':
+                    self._herb_weight += mother.weight - weight_before
+            self.update_fitness_animals(species)
 
     def migrate(self, adj_cells):
         """
@@ -276,7 +506,6 @@ class Landscape(ABC):
         adj_cells: list
             List of 4 adjacent cells
         """
-        adj_cells = np.array(adj_cells)
         for species, animals in self.in_cell_fauna.items():
             for animal in animals:
                 if animal.move_prob:
@@ -288,46 +517,95 @@ class Landscape(ABC):
                                                         total_propensity)
                                        for cell in adj_cells]
                         cum_probability = np.cumsum(probability)
-                        random_num = np.random.random()
+                        random_num = self._rng.random()
                         i = 0
                         while random_num > cum_probability[i]:
                             i += 1
                         cell_to_go = adj_cells[i]
                         if cell_to_go.is_accessible:
                             cell_to_go.add_animal(animal)
-                            self.remove_animal(animal)
+                            self._mark_removed(animal)
+        self._compact_fauna()
 
     @classmethod
-    def set_given_parameters(cls, given_parameters):
+    def updated_parameters(cls, given_parameters, parameters=None):
         """
-        Sets the user defined parameters that applies to Savannah, Jungle.
+        Checks the user defined parameters that applies to Savannah, Jungle
+        and returns a copy of the parameters updated with them.
         Parameters
         ----------
         given_parameters: dict
+        parameters: dict
+            Parameters to update, the class parameters if None
+        Returns
+        -------
+        parameters: dict
         """
-
+        if parameters is None:
+            parameters = cls.parameters
+        updated = dict(parameters)
         for parameter in given_parameters:
             if parameter in Savannah.parameters:
-                cls.parameters[parameter] = \
-                    given_parameters[parameter]
+                updated[parameter] = given_parameters[parameter]
             else:
                 raise RuntimeError('Unknown parameter, ' +
                                    str(parameter) +
                                    ' can\'t be set')
+        return updated
+
+    @classmethod
+    def set_given_parameters(cls, given_parameters):
+        """
+        Sets the user defined parameters that applies to Savannah, Jungle,
+        and compiles the new parameter snapshot of the landscape type.
+        Parameters
+        ----------
+        given_parameters: dict
+        """
+        cls.parameters.update(cls.updated_parameters(given_parameters))
+        cls.snapshot = cls.compile_parameters()
+
+    @classmethod
+    def compile_parameters(cls, parameters=None):
+        """
+        Builds the immutable snapshot of the landscape parameters.
+        Parameters
+        ----------
+        parameters: dict
+            Parameters to compile, the class parameters if None
+        Returns
+        -------
+        snapshot: ParameterSnapshot
+        """
+        if parameters is None:
+            parameters = cls.parameters
+        return ParameterSnapshot(parameters)
 
     @property
     def total_herb_weight(self):
-        return sum(i.weight for i in self.in_cell_fauna['Herbivore'])
+        """
+        Total weight of the herbivores in the cell. It is kept up to date
+        when herbivores are added, removed, eat, give birth or lose weight
+        through the cell.
+        Returns
+        -------
+        _herb_weight: float
+        """
+        return self._herb_weight
 
     @property
     def available_fodder(self):
-        if isinstance(self, (Ocean, Mountain)):
+        """
+        Fodder available for each species in the cell: plant fodder for
+        herbivores and herbivore weight for carnivores.
+        Returns
+        -------
+        available fodder: dict
+        """
+        if not self.is_accessible:
             return {'Herbivore': 0, 'Carnivore': 0}
-        elif isinstance(self, Desert):
-            return {'Herbivore': 0, 'Carnivore': self.total_herb_weight}
-        else:
-            return {'Herbivore': self.parameters['f_max'],
-                    'Carnivore': self.total_herb_weight}
+        return {'Herbivore': self.fodder,
+                'Carnivore': self._herb_weight}
 
 
 class Savannah(Landscape):
@@ -338,27 +616,45 @@ class Savannah(Landscape):
     is_accessible = True
     parameters = {'f_max': 300.0, 'alpha': 0.3}
 
-    def __init__(self, given_parameters=None):
+    def __init__(self, given_parameters=None, rng=None, snapshot=None):
         """
         Subclass of Landscape
         Parameters
         ----------
         given_parameters: dict
+        rng: numpy.random.Generator
+        snapshot: ParameterSnapshot
         """
-        super().__init__()
+        super().__init__(rng, snapshot)
         if given_parameters is not None:
             self.set_given_parameters(given_parameters)
         self.parameters = Savannah.parameters
+        self.fodder = self.initial_fodder(snapshot)
 
-    def _grow_herb_fodder(self):
+    @classmethod
+    def initial_fodder(cls, snapshot=None):
+        if snapshot is None:
+            snapshot = cls.snapshot
+        return snapshot.f_max
+
+    @classmethod
+    def grow_fodder(cls, fodder, snapshot=None):
         """
         Calculates new fodder growing in savannah according to the following
         equation:
         available_fodder + 'alpha' * ('f_max'- available_fodder)
+        Parameters
+        ----------
+        fodder: float or np.ndarray
+        snapshot: ParameterSnapshot
+            If None, the snapshot of the landscape type is used.
+        Returns
+        -------
+        fodder: float or np.ndarray
         """
-        self.available_fodder['Herbivore'] += \
-            self.parameters['alpha'] * (self.parameters['f_max'] -
-                                        self.available_fodder['Herbivore'])
+        if snapshot is None:
+            snapshot = cls.snapshot
+        return fodder + snapshot.alpha * (snapshot.f_max - fodder)
 
 
 class Jungle(Landscape):
@@ -369,24 +665,44 @@ class Jungle(Landscape):
     is_accessible = True
     parameters = {'f_max': 300.0}
 
-    def __init__(self, given_parameters=None):
+    def __init__(self, given_parameters=None, rng=None, snapshot=None):
         """
         saving the predefined parameters in the class variable.
         Parameters
         ----------
         given_parameters: dict
+        rng: numpy.random.Generator
+        snapshot: ParameterSnapshot
         """
-        super().__init__()
+        super().__init__(rng, snapshot)
         if given_parameters is not None:
             self.set_given_parameters(given_parameters)
         self.parameters = Jungle.parameters
+        self.fodder = self.initial_fodder(snapshot)
 
-    def _grow_herb_fodder(self):
+    @classmethod
+    def initial_fodder(cls, snapshot=None):
+        if snapshot is None:
+            snapshot = cls.snapshot
+        return snapshot.f_max
+
+    @classmethod
+    def grow_fodder(cls, fodder, snapshot=None):
         """
         Resets a fixed amount of fodder 'f_max' to available_fodder
         of herbivore.
+        Parameters
+        ----------
+        fodder: float or np.ndarray
+        snapshot: ParameterSnapshot
+            If None, the snapshot of the landscape type is used.
+        Returns
+        -------
+        fodder: float or np.ndarray
         """
-        self.available_fodder['Herbivore'] = self.parameters['f_max']
+        if snapshot is None:
+            snapshot = cls.snapshot
+        return fodder * 0 + snapshot.f_max
 
 
 class Desert(Landscape):
@@ -397,8 +713,8 @@ class Desert(Landscape):
     """
     is_accessible = True
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, rng=None, snapshot=None):
+        super().__init__(rng, snapshot)
 
 
 class Mountain(Landscape):
@@ -409,8 +725,8 @@ class Mountain(Landscape):
 
     is_accessible = False
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, rng=None, snapshot=None):
+        super().__init__(rng, snapshot)
 
 
 class Ocean(Landscape):
@@ -421,5 +737,9 @@ class Ocean(Landscape):
 
     is_accessible = False
 
-    def __init__(self):
-        super().__init__()
\ No newline at end of file
+    def __init__(self, rng=None, snapshot=None):
+        super().__init__(rng, snapshot)
+
+
+Savannah.snapshot = Savannah.compile_parameters()
+Jungle.snapshot = Jungle.compile_parameters()
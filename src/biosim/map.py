@@ -8,26 +8,36 @@ The map class contains map class. It has large scale methods like
 - giving birth in all cells
 - feeding in all cells
 - lose weights for all animals in all cells
-and it has the life cycle for each year
+and it has the life cycle for each year.
+The animals are kept in a columnar population store (see population.py) and
+all stages work on the arrays of that store.
+Every map has its own parameters: it starts from the current parameter
+snapshots of the species and landscape classes, and set_animal_parameters
+and set_landscape_parameters only change the snapshots of the map.
 """
 
 __author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
 __email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
 
-from .landscapes import Desert, Ocean, Mountain, Savannah, Jungle
-from .fauna import Herbivore, Carnivore
+from .landscapes import Landscape, Desert, Ocean, Mountain, Savannah, Jungle
+from .fauna import Fauna
+from .population import Population
 import numpy as np
 
 
 class Map:
 
-    def __init__(self, island_map):
+    def __init__(self, island_map, rng=None):
         """
         The constructor for Map class.
         Parameters
         ----------
         island_map: str
+        rng: numpy.random.Generator
+            Random number generator for all draws of the simulation. If None,
+            the global numpy random functions are used.
         """
+        self._rng = np.random if rng is None else rng
 
         self._map = island_map
         self._island_map = self._string_to_np_array()
@@ -37,18 +47,31 @@ class Map:
                                    'M': Mountain,
                                    'J': Jungle,
                                    'D': Desert}
-        self._fauna_classes = {'Carnivore': Carnivore,
-                               'Herbivore': Herbivore}
+        self._landscape_snapshots = {
+            letter: landscape_class.snapshot
+            for letter, landscape_class in self._landscape_classes.items()}
 
         self._cells = self.create_map_of_landscape_objects()
         rows = self._cells.shape[0]
         cols = self._cells.shape[1]
         self.cells_dims = rows, cols
+        self._population = Population(rows * cols)
+        self._fodder = np.array([[cell.fodder for cell in row]
+                                 for row in self._cells], dtype=float)
+        self._accessible = np.array([cell.is_accessible
+                                     for cell in self._cells.flat])
+        self._counts = {species: np.zeros(rows * cols, dtype=int)
+                        for species in self._population}
+        self._occupancy = np.zeros(rows * cols, dtype=int)
+        self._neighbours, self._neighbour_accessible = \
+            self._neighbour_table()
 
     @property
     def cells(self):
         """
-        Returns full data matrix.
+        Returns the matrix of landscape cells. The cells only carry the
+        landscape type and its parameters, the animals and the fodder are
+        kept by the map, see cell_fauna, fodder and num_animals_per_cell.
         Returns
         -------
         _cells: matrix
@@ -65,7 +88,8 @@ class Map:
         -------
         class of landscape (Jungle, Mountain, Savannah, Ocean, Desert)
         """
-        return self._landscape_classes[cell_letter]()
+        return self._landscape_classes[cell_letter](
+            rng=self._rng, snapshot=self._landscape_snapshots[cell_letter])
 
     @staticmethod
     def _edges(map_array):
@@ -114,6 +138,167 @@ class Map:
                 cells_array[i][j] = self._create_cell(cell_letter)
         return cells_array
 
+    @property
+    def population(self):
+        """
+        Returns the columnar population store of the island.
+        Returns
+        -------
+        _population: Population
+        """
+        return self._population
+
+    @property
+    def fodder(self):
+        """
+        Returns the herbivore fodder available in every cell.
+        Returns
+        -------
+        _fodder: np.ndarray
+            Matrix of the same dimensions as the island
+        """
+        return self._fodder
+
+    def _grow_fodder(self):
+        """
+        Grows the herbivore fodder of all cells of each landscape type at
+        once.
+        """
+        for letter, landscape_class in self._landscape_classes.items():
+            cells = self._island_map == letter
+            self._fodder[cells] = landscape_class.grow_fodder(
+                self._fodder[cells], self._landscape_snapshots[letter])
+
+    def set_animal_parameters(self, species, params):
+        """
+        Sets parameters of the animals of the given species on this map
+        only.
+        Parameters
+        ----------
+        species: str
+        params: dict
+        """
+        self._population[species].set_given_parameters(params)
+
+    def set_landscape_parameters(self, landscape, params):
+        """
+        Sets parameters of the cells of the given landscape type on this map
+        only.
+        Parameters
+        ----------
+        landscape: str
+            Code letter of the landscape
+        params: dict
+        """
+        landscape_class = self._landscape_classes[landscape]
+        snapshot = landscape_class.compile_parameters(
+            landscape_class.updated_parameters(
+                params, self._landscape_snapshots[landscape].as_dict()))
+        self._landscape_snapshots[landscape] = snapshot
+        for cell in self._cells[self._island_map == landscape]:
+            cell.active_snapshot = snapshot
+
+    @property
+    def parameters(self):
+        """
+        Parameters of this map, by species name and landscape code letter.
+        Returns
+        -------
+        parameters: dict
+            Dictionary of parameter dictionaries
+        """
+        parameters = {species: population.parameters
+                      for species, population in self._population.items()}
+        for letter, snapshot in self._landscape_snapshots.items():
+            parameters[letter] = snapshot.as_dict()
+        return parameters
+
+    def state_arrays(self):
+        """
+        The state of the island as NumPy arrays: the fodder of every cell and
+        the age, weight, fitness and cell of every animal, in store order.
+        Returns
+        -------
+        arrays: dict
+            Arrays by name, e.g. 'fodder' or 'Herbivore_weight'
+        """
+        arrays = {'fodder': self._fodder.copy()}
+        for species, population in self._population.items():
+            arrays[species + '_age'] = population.age.copy()
+            arrays[species + '_weight'] = population.weight.copy()
+            arrays[species + '_fitness'] = population.fitness.copy()
+            arrays[species + '_cell'] = population.cell.copy()
+        return arrays
+
+    def restore_state(self, arrays, parameters=None):
+        """
+        Restores the state saved by state_arrays, and optionally the
+        parameters given by the parameters property.
+        Parameters
+        ----------
+        arrays: dict
+        parameters: dict
+        """
+        if parameters is not None:
+            for key, params in parameters.items():
+                if key in self._population.species_classes:
+                    self.set_animal_parameters(key, params)
+                else:
+                    self.set_landscape_parameters(key, params)
+        self._fodder[:] = arrays['fodder']
+        self._occupancy[:] = 0
+        for species, population in self._population.items():
+            population.restore(arrays[species + '_age'],
+                               arrays[species + '_weight'],
+                               arrays[species + '_fitness'],
+                               arrays[species + '_cell'])
+            self._counts[species][:] = 0
+            self._update_counts(species, population.cell)
+
+    @property
+    def active_cells(self):
+        """
+        Flat indices of the accessible cells that currently hold animals.
+        Only these cells are visited by the stages of the life cycle.
+        Returns
+        -------
+        active cells: np.ndarray of int
+        """
+        return np.flatnonzero((self._occupancy > 0) & self._accessible)
+
+    def _update_counts(self, species, cells, change=1):
+        """
+        Updates the number of animals of the given species per cell, and the
+        total number of animals per cell, when animals are added to
+        (change=1) or removed from (change=-1) the given cells.
+        Parameters
+        ----------
+        species: str
+        cells: np.ndarray of int
+            Flat cell index of every added or removed animal
+        change: int
+        """
+        cell_change = change * np.bincount(
+            cells, minlength=self._occupancy.shape[0])
+        self._counts[species] += cell_change
+        self._occupancy += cell_change
+
+    def _cell_index(self, loc):
+        """
+        Flat index of the cell at the given location.
+        Parameters
+        ----------
+        loc: tuple
+        Returns
+        -------
+        cell index: int
+        """
+        x, y = loc
+        rows, cols = self.cells_dims
+        if not (0 <= x < rows and 0 <= y < cols):
+            raise IndexError('Location {} is outside the island'.format(loc))
+        return x * cols + y
+
     def _string_to_np_array(self):
         """
         Converts string to numpy array with the same diemsions.
@@ -126,6 +311,28 @@ class Map:
             [[j for j in i] for i in map_string_clean.splitlines()])
         return char_map
 
+    def _neighbour_table(self):
+        """
+        Builds the flat indices of the 4 adjacent cells (up, down, left,
+        right) of every cell, once for the whole map. Neighbours outside the
+        map are set to -1.
+        Returns
+        -------
+        neighbours: np.ndarray of int
+            Array of shape (number of cells, 4)
+        accessible: np.ndarray of bool
+            True where the neighbour exists and is accessible by animals
+        """
+        rows, cols = self.cells_dims
+        x, y = np.divmod(np.arange(rows * cols), cols)
+        neighbours = np.full((rows * cols, 4), -1, dtype=int)
+        for k, (dx, dy) in enumerate(((-1, 0), (1, 0), (0, -1), (0, 1))):
+            inside = (0 <= x + dx) & (x + dx < rows) & \
+                     (0 <= y + dy) & (y + dy < cols)
+            neighbours[inside, k] = (x[inside] + dx) * cols + y[inside] + dy
+        accessible = (neighbours >= 0) & self._accessible[neighbours]
+        return neighbours, accessible
+
     def _adj_cells(self, x, y):
         """
         Returns the list of 4 adjacent cells.
@@ -138,17 +345,8 @@ class Map:
         adj_cells_list: list
             List of 4 adjacent cells
         """
-        rows, cols = self.cells_dims
-        adj_cells_list = []
-        if x > 0:
-            adj_cells_list.append(self._cells[x - 1, y])
-        if x + 1 < rows:
-            adj_cells_list.append(self._cells[x + 1, y])
-        if y > 0:
-            adj_cells_list.append(self._cells[x, y - 1])
-        if y + 1 < cols:
-            adj_cells_list.append(self._cells[x, y + 1])
-        return adj_cells_list
+        neighbours = self._neighbours[self._cell_index((x, y))]
+        return [self._cells.flat[j] for j in neighbours if j >= 0]
 
     def add_animals(self, pop):
         """
@@ -158,17 +356,24 @@ class Map:
         ----------
         pop: iterable
         """
+        new_animals = {species: ([], [], []) for species in self._population}
         for animal_group in pop:
-            loc = animal_group['loc']
+            cell_index = self._cell_index(animal_group['loc'])
             animals = animal_group['pop']
             for animal in animals:
                 species = animal['species']
                 age = animal['age']
                 weight = animal['weight']
-                species_class = self._fauna_classes[species]
-                animal_object = species_class(age=age, weight=weight)
-                cell = self._cells[loc]
-                cell.add_animal(animal_object)
+                Fauna.raise_non_valid_attribute('Age', age)
+                Fauna.raise_non_valid_attribute('Weight', weight)
+                ages, weights, cells = new_animals[species]
+                ages.append(age)
+                weights.append(weight)
+                cells.append(cell_index)
+        for species, (ages, weights, cells) in new_animals.items():
+            if len(ages) > 0:
+                self._population[species].append(ages, weights, cells)
+                self._update_counts(species, np.array(cells))
 
     def total_num_animals_per_species(self, species):
         """
@@ -180,13 +385,40 @@ class Map:
         -------
         num_animals: dict
         """
-        num_animals = 0
-        rows, cols = self.cells_dims
-        for x in range(0, rows):
-            for y in range(0, cols):
-                cell = self._cells[x, y]
-                num_animals += len(cell.in_cell_fauna[species])
-        return num_animals
+        return self._population.num_animals(species)
+
+    def num_animals_per_cell(self, species):
+        """
+        Number of animals of the given species in each cell. The counts are
+        kept up to date as animals are added, born, die or move, so this is
+        a read only view of them and not a new count.
+        Parameters
+        ----------
+        species: str
+        Returns
+        -------
+        counts: np.ndarray
+            Matrix of the same dimensions as the island
+        """
+        counts = self._counts[species].reshape(self.cells_dims)
+        counts.flags.writeable = False
+        return counts
+
+    def cell_fauna(self, loc):
+        """
+        Object view of the animals living in the cell with the given location.
+        The objects are copies without the random number generator of the
+        map, so calling their probability methods does not change the
+        simulation.
+        Parameters
+        ----------
+        loc: tuple
+        Returns
+        -------
+        in_cell_fauna: dict
+            Lists of Fauna objects by species
+        """
+        return self._population.fauna_in_cell(self._cell_index(loc))
 
     def life_cycle(self):
         """
@@ -195,60 +427,220 @@ class Map:
         self._feed_stage()
         self._give_birth_stage()
         self._migrate_stage()
-        self._grow_up_stage()
-        self._lose_weight_stage()
-        self._die_stage()
+        self._age_lose_weight_die_stage()
 
     def _feed_stage(self):
         """
-        feeding all the animals in all cells
+        feeding all the animals in all cells. Herbivores with the highest
+        fitness eat first, then carnivores with the highest fitness hunt
+        first, trying the herbivores with the lowest fitness first.
+        """
+        self._grow_fodder()
+        herbivores = self._population['Herbivore']
+        carnivores = self._population['Carnivore']
+        num_cells = self._population.num_cells
+        herbivores.sort_by_cell(by_fitness=True)
+        carnivores.sort_by_cell(by_fitness=True)
+        herb_bounds = herbivores.cell_bounds(num_cells)
+        carn_bounds = carnivores.cell_bounds(num_cells)
+        self._feed_herbivores(herbivores, herb_bounds)
+        herbivores.update_fitness()
+
+        killed = np.zeros(len(herbivores), dtype=bool)
+        active_cells = self.active_cells
+        hunting_cells = active_cells[
+            (herb_bounds[active_cells + 1] > herb_bounds[active_cells]) &
+            (carn_bounds[active_cells + 1] > carn_bounds[active_cells])]
+        for cell_index in hunting_cells:
+            herbs = np.arange(herb_bounds[cell_index],
+                              herb_bounds[cell_index + 1])
+            carns = np.arange(carn_bounds[cell_index],
+                              carn_bounds[cell_index + 1])
+            self._feed_carnivores(carnivores, carns, herbivores, herbs,
+                                  killed)
+        carnivores.update_fitness()
+        self._update_counts('Herbivore', herbivores.cell[killed], -1)
+        herbivores.keep(~killed)
+
+    def _feed_herbivores(self, herbivores, herb_bounds):
+        """
+        Feeds the herbivores of all cells at once. Inside each cell the
+        herbivores eat in order of descending fitness following the eating
+        rules of Landscape.herbivore_portions: the portion of each herbivore
+        follows from its rank in the cell, and the fodder left in a cell from
+        the number of herbivores in it.
+        Parameters
+        ----------
+        herbivores: SpeciesPopulation
+            Sorted by cell and by descending fitness inside each cell
+        herb_bounds: np.ndarray
+            Start index of every cell's slice of herbivores
+        """
+        appetite = herbivores.snapshot.F
+        fodder = self._fodder.ravel()
+        rank = np.arange(len(herbivores)) - herb_bounds[herbivores.cell]
+        portions = Landscape.herbivore_portions(fodder[herbivores.cell],
+                                                rank, appetite)
+        herbivores.weight += herbivores.snapshot.beta * portions
+        fodder[:] = Landscape.fodder_left(fodder, np.diff(herb_bounds),
+                                          appetite)
+
+    def _feed_carnivores(self, carnivores, carns, herbivores, herbs, killed):
         """
-        rows, cols = self.cells_dims
-        for x in range(rows):
-            for y in range(cols):
-                self._cells[x, y].feed_animals()
+        Carnivores of one cell hunt in the given order. A carnivore continues
+        to kill herbivores, weakest first, until it has eaten herbivores with
+        a total weight of 'F' or it has tried to kill each herbivore in the
+        cell. Killed herbivores are marked in killed.
+        Parameters
+        ----------
+        carnivores: SpeciesPopulation
+        carns: np.ndarray
+            Rows of the carnivores of the cell, sorted by descending fitness
+        herbivores: SpeciesPopulation
+        herbs: np.ndarray
+            Rows of the herbivores of the cell
+        killed: np.ndarray of bool
+        """
+        params = carnivores.snapshot
+        prey = herbs[np.argsort(herbivores.fitness[herbs], kind='stable')]
+        eaten, prey_killed = Landscape.predation(
+            carnivores.fitness[carns], herbivores.fitness[prey],
+            herbivores.weight[prey], params.F, params.DeltaPhiMax, self._rng)
+        carnivores.weight[carns] += params.beta * eaten
+        killed[prey[prey_killed]] = True
 
     def _give_birth_stage(self):
         """
         giving birth all the animals in all cells, then adding newborn babies
         to the adult animals to be considered in procreatation next year and
-        also to be considered in all life cycle stages.
-        """
-        rows, cols = self.cells_dims
-        for x in range(rows):
-            for y in range(cols):
-                self._cells[x, y].give_birth_animals()
+        also to be considered in all life cycle stages. Only the first half
+        of the animals of a cell may give birth, in the order the feed stage
+        left them in, as in Landscape.give_birth_animals: the fittest half
+        of the carnivores and the least fit half of the herbivores.
+        """
+        num_cells = self._population.num_cells
+        for species, population in self._population.items():
+            population.sort_by_cell()
+            bounds = population.cell_bounds(num_cells)
+            num_fauna = np.diff(bounds)[population.cell]
+            rank = np.arange(len(population)) - bounds[population.cell]
+            if species == 'Herbivore':
+                # the store holds them by descending fitness, while
+                # sort_by_fitness lists herbivores by ascending fitness
+                rank = num_fauna - 1 - rank
+            parents = np.flatnonzero(
+                (rank < num_fauna // 2) & self._accessible[population.cell])
+            params = population.snapshot
+            mothers, baby_weights = population.species_class.give_birth_batch(
+                population.weight[parents], population.fitness[parents],
+                num_fauna[parents], params, self._rng)
+            mothers = parents[mothers]
+            population.weight[mothers] -= params.xi * baby_weights
+            population.update_fitness(mothers)
+            baby_cells = population.cell[mothers]
+            population.append(np.zeros(len(mothers)), baby_weights,
+                              baby_cells)
+            self._update_counts(species, baby_cells)
 
-    def _grow_up_stage(self):
-        """
-        growing up all the animals in all cells
-        """
-        rows, cols = self.cells_dims
-        for x in range(rows):
-            for y in range(cols):
-                self._cells[x, y].grow_up_animals()
+    def _age_lose_weight_die_stage(self):
+        """
+        End of the year for all the animals in all cells, in one pass per
+        species: every animal grows one year older and loses 'eta' of its
+        weight, fitness is recomputed once, and then the animals die with
+        probability 'omega' * (1 - fitness). An animal with zero fitness
+        always dies. This gives the same result as aging, losing weight and
+        dying in three separate stages.
+        """
+        for species, population in self._population.items():
+            params = population.snapshot
+            population.age += 1
+            population.weight -= population.weight * params.eta
+            population.update_fitness()
+            dies = population.species_class.die_batch(population.fitness,
+                                                      params, self._rng)
+            self._update_counts(species, population.cell[dies], -1)
+            population.keep(~dies)
 
-    def _lose_weight_stage(self):
-        """
-        losing weight for all the animals in all cells
+    def log_propensity_field(self, species):
         """
-        rows, cols = self.cells_dims
-        for x in range(rows):
-            for y in range(cols):
-                self._cells[x, y].lose_weight_animals()
+        Logarithm of the propensity of every cell to attract animals of the
+        given species, 'lambda' * E_k with E_k the relative abundance of
+        fodder. It is -inf for cells that animals can not enter. Migration
+        works with the logarithm, as e ^ ('lambda' * E_k) overflows for
+        large 'lambda' * E_k.
+        Parameters
+        ----------
+        species: str
+        Returns
+        -------
+        log_propensity: np.ndarray
+            Matrix of the same dimensions as the island
+        """
+        num_cells = self._population.num_cells
+        population = self._population[species]
+        params = population.snapshot
+        if species == 'Herbivore':
+            relevant_fodder = self._fodder.ravel()
+        else:
+            relevant_fodder = self._population['Herbivore'].weight_per_cell(
+                num_cells)
+        abundance = relevant_fodder / (
+            (self._counts[species] + 1) * params.F)
+        log_propensity = np.where(self._accessible,
+                                  params.lambda_ * abundance, -np.inf)
+        return log_propensity.reshape(self.cells_dims)
 
-    def _die_stage(self):
+    def propensity_field(self, species):
         """
-        die all the animals that are with higher probability in all cells
+        Propensity of every cell to attract animals of the given species,
+        e ^ ('lambda' * E_k) with E_k the relative abundance of fodder. It is
+        zero for cells that animals can not enter. The value only depends on
+        the cell and the species, so it is computed once for all cells.
+        Parameters
+        ----------
+        species: str
+        Returns
+        -------
+        propensity: np.ndarray
+            Matrix of the same dimensions as the island
         """
-        rows, cols = self.cells_dims
-        for x in range(rows):
-            for y in range(cols):
-                self._cells[x, y].die_animals()
+        return np.exp(self.log_propensity_field(species))
 
     def _migrate_stage(self):
         """
-        migrate all the animals in all cells
-        """
-        for [x, y], cell in np.ndenumerate(self._cells):
-            cell.migrate(self._adj_cells(x, y))
+        migrate all the animals in all cells. Each animal moves with
+        probability 'mu' * fitness to one of the adjacent cells, chosen
+        according to the propensity of the cells. An animal migrates at most
+        once per year. Propensity fields are computed once per species, the
+        herbivores move first and the carnivores then follow the new
+        distribution of herbivores. The propensities of the neighbours of a
+        cell are divided by the largest of them, which leaves the
+        probabilities unchanged and keeps the propensities finite.
+        """
+        for species, population in self._population.items():
+            log_propensity = self.log_propensity_field(species).ravel()
+            moves = self._rng.random(len(population)) < \
+                population.snapshot.mu * population.fitness
+            movers = np.flatnonzero(moves)
+            old_cells = population.cell[movers]
+            neighbours = self._neighbours[old_cells]
+            neighbour_log = np.where(self._neighbour_accessible[old_cells],
+                                     log_propensity[neighbours], -np.inf)
+            max_log = neighbour_log.max(axis=1, initial=-np.inf)
+            # movers without accessible neighbours keep zero propensities
+            max_log[max_log == -np.inf] = 0
+            neighbour_propensity = np.exp(
+                neighbour_log - max_log[:, np.newaxis])
+            cum_propensity = np.cumsum(neighbour_propensity, axis=1)
+            total_propensity = cum_propensity[:, -1]
+            random_num = self._rng.random(len(movers)) * total_propensity
+            k = np.sum(cum_propensity <= random_num[:, np.newaxis], axis=1)
+            # guard against random_num rounding up to the total propensity
+            last = 3 - np.argmax(neighbour_propensity[:, ::-1] > 0, axis=1)
+            k = np.where(k > 3, last, k)
+            can_move = total_propensity > 0
+            movers = movers[can_move]
+            new_cells = neighbours[can_move, k[can_move]]
+            self._update_counts(species, population.cell[movers], -1)
+            self._update_counts(species, new_cells)
+            population.cell[movers] = new_cells
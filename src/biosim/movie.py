@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""
+Movie writer that streams frames straight into ffmpeg. The figure is drawn
+into its canvas buffer and the raw RGBA pixels are written to the standard
+input of an ffmpeg process, which encodes them while the simulation goes on.
+No image files are written and ffmpeg does not have to decode them again.
+"""
+
+__author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
+__email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
+
+import subprocess
+
+import numpy as np
+
+_DEFAULT_FPS = 25
+
+_CODEC_OPTIONS = {
+    # Parameters chosen according to http://trac.ffmpeg.org/wiki/Encode/H.264,
+    # section "Compatibility", yuv420p needs an even width and height
+    'mp4': ['-vcodec', 'libx264',
+            '-profile:v', 'baseline',
+            '-level', '3.0',
+            '-pix_fmt', 'yuv420p',
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2'],
+    'gif': [],
+}
+
+
+class MovieWriter:
+    """
+    Encodes the frames of a figure to a movie file with ffmpeg. The ffmpeg
+    process is started with the first frame, when the frame size is known,
+    and the movie is complete once close is called.
+    """
+
+    def __init__(self, filename, movie_fmt='mp4', fps=_DEFAULT_FPS,
+                 binary='ffmpeg'):
+        """
+        The constructor for MovieWriter class.
+
+        Parameters
+        ----------
+        filename: str
+            Name of the movie file, including path and extension
+        movie_fmt: str
+            'mp4' or 'gif'
+        fps: int
+            Frames per second of the movie
+        binary: str
+            Name or path of the ffmpeg executable
+        """
+        if movie_fmt not in _CODEC_OPTIONS:
+            raise ValueError('Unknown movie format: ' + movie_fmt)
+        self.filename = filename
+        self.movie_fmt = movie_fmt
+        self.fps = fps
+        self.binary = binary
+        self.frame_size = None
+        self.num_frames = 0
+        self._process = None
+
+    def command(self, width, height):
+        """
+        ffmpeg command reading raw RGBA frames of the given size from its
+        standard input.
+
+        Parameters
+        ----------
+        width: int
+        height: int
+
+        Returns
+        -------
+        command: list of str
+        """
+        return ([self.binary,
+                 '-loglevel', 'error',
+                 '-y',
+                 '-f', 'rawvideo',
+                 '-pix_fmt', 'rgba',
+                 '-s', '{}x{}'.format(width, height),
+                 '-r', str(self.fps),
+                 '-i', '-']
+                + _CODEC_OPTIONS[self.movie_fmt]
+                + [self.filename])
+
+    def _open(self, width, height):
+        try:
+            self._process = subprocess.Popen(self.command(width, height),
+                                             stdin=subprocess.PIPE)
+        except OSError as err:
+            raise RuntimeError('ERROR: ffmpeg could not be started: '
+                               '{}'.format(err))
+        self.frame_size = (width, height)
+
+    def write_frame(self, fig, draw=True):
+        """
+        Draws the figure and sends its pixels to ffmpeg.
+
+        Parameters
+        ----------
+        fig: matplotlib.figure.Figure
+        draw: bool
+            False if the canvas already shows the current frame
+        """
+        if draw:
+            fig.canvas.draw()
+        frame = fig.canvas.buffer_rgba()
+        height, width = np.asarray(frame).shape[:2]
+        if self._process is None:
+            self._open(width, height)
+        elif (width, height) != self.frame_size:
+            raise ValueError('Frame size changed from {}x{} to {}x{}'.format(
+                *self.frame_size, width, height))
+        try:
+            self._process.stdin.write(frame)
+        except BrokenPipeError:
+            self._process.wait()
+            raise RuntimeError('ERROR: ffmpeg failed with exit status '
+                               '{}'.format(self._process.returncode))
+        self.num_frames += 1
+
+    def close(self):
+        """
+        Ends the stream and waits until ffmpeg has written the movie.
+        """
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        process.stdin.close()
+        if process.wait() != 0:
+            raise RuntimeError('ERROR: ffmpeg failed with exit status '
+                               '{}'.format(process.returncode))
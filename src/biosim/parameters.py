@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""
+Immutable parameter snapshots. The parameters of an animal species or a
+landscape type are given by the user as a dictionary, while the annual cycle
+reads them very often. A ParameterSnapshot holds the values of such a
+dictionary as plain attributes, together with constants derived from them,
+and is rebuilt every time the parameters are set.
+"""
+
+__author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
+__email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
+
+import keyword
+
+import numpy as np
+
+
+class ParameterSnapshot:
+    """
+    Read only view of a parameter dictionary and its derived constants. The
+    values are read as attributes, e.g. snapshot.F, or by their dictionary
+    key, e.g. snapshot['F']. Keys that are Python keywords get a trailing
+    underscore as attribute name, so 'lambda' is read as snapshot.lambda_.
+    """
+
+    def __init__(self, parameters, **derived):
+        """
+        The constructor for ParameterSnapshot class. NumPy arrays among the
+        values are stored as read only copies.
+
+        Parameters
+        ----------
+        parameters: dict
+            Parameter values given by the user
+        derived: keyword arguments
+            Constants computed from the parameters
+        """
+        values = dict(parameters)
+        values.update(derived)
+        for name, value in values.items():
+            if isinstance(value, np.ndarray):
+                value = value.copy()
+                value.flags.writeable = False
+            object.__setattr__(self, self.attribute_name(name), value)
+        object.__setattr__(self, '_keys', tuple(parameters))
+
+    @staticmethod
+    def attribute_name(name):
+        """
+        Attribute name under which a parameter is stored.
+
+        Parameters
+        ----------
+        name: str
+
+        Returns
+        -------
+        attribute name: str
+        """
+        return name + '_' if keyword.iskeyword(name) else name
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, self.attribute_name(name))
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __contains__(self, name):
+        return hasattr(self, self.attribute_name(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Parameter snapshots can\'t be changed, use '
+                             'set_given_parameters instead')
+
+    def __delattr__(self, name):
+        raise AttributeError('Parameter snapshots can\'t be changed, use '
+                             'set_given_parameters instead')
+
+    def as_dict(self):
+        """
+        The parameter values the snapshot was built from.
+
+        Returns
+        -------
+        parameters: dict
+        """
+        return {name: self[name] for name in self._keys}
+
+    def __repr__(self):
+        return 'ParameterSnapshot({!r})'.format(self.as_dict())
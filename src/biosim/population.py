@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+
+"""
+Columnar population store. Instead of one Fauna object per animal, all
+animals of one species on the island are kept as rows of a few NumPy arrays
+(age, weight, fitness and the flat index of the cell they live in). The Map
+runs the annual cycle directly on these arrays, while Fauna objects can still
+be produced as a thin view of the stored rows.
+"""
+
+__author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
+__email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
+
+import numpy as np
+
+from .fauna import Herbivore, Carnivore
+
+
+class SpeciesPopulation:
+    """
+    All animals of one species stored as a structure of arrays. Row i of
+    age, weight, fitness and cell describes the same animal. The population
+    has its own parameter snapshot, so populations of the same species can
+    use different parameters.
+    """
+
+    def __init__(self, species_class, snapshot=None):
+        """
+        The constructor for SpeciesPopulation class.
+
+        Parameters
+        ----------
+        species_class: Herbivore or Carnivore class
+        snapshot: ParameterSnapshot
+            Parameters of the population, the current snapshot of the
+            species if None
+        """
+        self.species_class = species_class
+        self.snapshot = species_class.snapshot if snapshot is None \
+            else snapshot
+        self.age = np.empty(0, dtype=int)
+        self.weight = np.empty(0, dtype=float)
+        self.fitness = np.empty(0, dtype=float)
+        self.cell = np.empty(0, dtype=int)
+
+    def __len__(self):
+        return self.age.shape[0]
+
+    @property
+    def parameters(self):
+        """
+        Returns the parameters of the animals stored in this population.
+
+        Returns
+        -------
+        parameters: dict
+        """
+        return self.snapshot.as_dict()
+
+    def set_given_parameters(self, params):
+        """
+        Sets user defined parameter values for this population only, by
+        compiling a new snapshot. The parameters of the species class are
+        not changed.
+
+        Parameters
+        ----------
+        params: dict
+        """
+        self.snapshot = self.species_class.compile_parameters(
+            self.species_class.updated_parameters(params, self.parameters))
+        self.update_fitness()
+
+    def append(self, ages, weights, cells):
+        """
+        Appends new animals at the end of the arrays and computes their
+        fitness.
+
+        Parameters
+        ----------
+        ages: array_like of int
+        weights: array_like of float
+        cells: array_like of int
+            Flat index of the cell each new animal lives in
+        """
+        num_old = len(self)
+        self.age = np.concatenate((self.age, np.asarray(ages, dtype=int)))
+        self.weight = np.concatenate((self.weight,
+                                      np.asarray(weights, dtype=float)))
+        self.cell = np.concatenate((self.cell, np.asarray(cells, dtype=int)))
+        self.fitness = np.concatenate((self.fitness,
+                                       np.zeros(len(self) - num_old)))
+        self.update_fitness(np.arange(num_old, len(self)))
+
+    def restore(self, ages, weights, fitness, cells):
+        """
+        Replaces all animals by the given rows, e.g. from a checkpoint. The
+        fitness is taken as given.
+
+        Parameters
+        ----------
+        ages: array_like of int
+        weights: array_like of float
+        fitness: array_like of float
+        cells: array_like of int
+        """
+        self.age = np.array(ages, dtype=int)
+        self.weight = np.array(weights, dtype=float)
+        self.fitness = np.array(fitness, dtype=float)
+        self.cell = np.array(cells, dtype=int)
+
+    def keep(self, alive):
+        """
+        Compacts the arrays, keeping only the rows where alive is True.
+
+        Parameters
+        ----------
+        alive: np.ndarray of bool
+        """
+        self.age = self.age[alive]
+        self.weight = self.weight[alive]
+        self.fitness = self.fitness[alive]
+        self.cell = self.cell[alive]
+
+    def reorder(self, order):
+        """
+        Reorders all arrays with the given permutation.
+
+        Parameters
+        ----------
+        order: np.ndarray of int
+        """
+        self.age = self.age[order]
+        self.weight = self.weight[order]
+        self.fitness = self.fitness[order]
+        self.cell = self.cell[order]
+
+    def sort_by_cell(self, by_fitness=False):
+        """
+        Sorts the animals by cell, so that the animals of one cell are a
+        contiguous slice of the arrays. Inside a cell, the animals are
+        ordered by descending fitness if by_fitness is True, otherwise their
+        relative order is kept.
+
+        Parameters
+        ----------
+        by_fitness: bool
+        """
+        if by_fitness:
+            order = np.lexsort((-self.fitness, self.cell))
+        else:
+            order = np.argsort(self.cell, kind='stable')
+        self.reorder(order)
+
+    def cell_bounds(self, num_cells):
+        """
+        Returns the start index of every cell's slice, the animals have to be
+        sorted by cell first. The animals of cell c are the rows
+        bounds[c]:bounds[c + 1].
+
+        Parameters
+        ----------
+        num_cells: int
+
+        Returns
+        -------
+        bounds: np.ndarray of int
+        """
+        return np.searchsorted(self.cell, np.arange(num_cells + 1))
+
+    def count_per_cell(self, num_cells):
+        """
+        Number of animals in every cell.
+
+        Parameters
+        ----------
+        num_cells: int
+
+        Returns
+        -------
+        counts: np.ndarray of int
+        """
+        return np.bincount(self.cell, minlength=num_cells)
+
+    def weight_per_cell(self, num_cells):
+        """
+        Total weight of the animals in every cell.
+
+        Parameters
+        ----------
+        num_cells: int
+
+        Returns
+        -------
+        weights: np.ndarray of float
+        """
+        return np.bincount(self.cell, weights=self.weight,
+                           minlength=num_cells)
+
+    def update_fitness(self, index=slice(None)):
+        """
+        Recomputes the fitness of the given rows from their age and weight.
+
+        Parameters
+        ----------
+        index: slice or np.ndarray of int
+        """
+        self.fitness[index] = self.species_class.batch_fitness(
+            self.age[index], self.weight[index], self.snapshot)
+
+    def fauna_in_cell(self, cell, rng=None):
+        """
+        Builds Fauna objects of the animals living in the given cell. The
+        objects are copies; changing them does not change the store.
+
+        Parameters
+        ----------
+        cell: int
+        rng: numpy.random.Generator
+            Random number generator given to the Fauna objects
+
+        Returns
+        -------
+        animals: list of Fauna objects
+        """
+        rows = np.flatnonzero(self.cell == cell)
+        return [self.species_class(age=int(self.age[i]),
+                                   weight=float(self.weight[i]), rng=rng,
+                                   snapshot=self.snapshot)
+                for i in rows]
+
+
+class Population:
+    """
+    Population store of the whole island, one SpeciesPopulation per species.
+    """
+    species_classes = {'Herbivore': Herbivore, 'Carnivore': Carnivore}
+
+    def __init__(self, num_cells):
+        """
+        The constructor for Population class.
+
+        Parameters
+        ----------
+        num_cells: int
+            Number of cells of the island
+        """
+        self.num_cells = num_cells
+        self._species = {species: SpeciesPopulation(species_class)
+                         for species, species_class in
+                         self.species_classes.items()}
+
+    def __getitem__(self, species):
+        return self._species[species]
+
+    def __iter__(self):
+        return iter(self._species)
+
+    def items(self):
+        return self._species.items()
+
+    def values(self):
+        return self._species.values()
+
+    def num_animals(self, species):
+        """
+        Number of animals of the given species on the island.
+
+        Parameters
+        ----------
+        species: str
+
+        Returns
+        -------
+        num_animals: int
+        """
+        return len(self._species[species])
+
+    def count_per_cell(self, species):
+        """
+        Number of animals of the given species in every cell.
+
+        Parameters
+        ----------
+        species: str
+
+        Returns
+        -------
+        counts: np.ndarray of int
+        """
+        return self._species[species].count_per_cell(self.num_cells)
+
+    def fauna_in_cell(self, cell, rng=None):
+        """
+        Object view of the animals of one cell, in the same layout as
+        Landscape.in_cell_fauna.
+
+        Parameters
+        ----------
+        cell: int
+        rng: numpy.random.Generator
+
+        Returns
+        -------
+        in_cell_fauna: dict
+        """
+        return {species: population.fauna_in_cell(cell, rng)
+                for species, population in self._species.items()}
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+"""
+Background rendering of the simulation graphics. A RenderWorker owns a
+figure in a separate process and draws the frames there, saves them as
+images and streams them into a movie, while the simulation continues with
+the next year. The simulation only sends compact snapshots of a year: the
+animal count matrices, the totals and the year. The snapshots pass through
+a bounded queue, so the simulation waits when rendering falls behind and
+the memory used by pending frames stays bounded.
+"""
+
+__author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
+__email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
+
+import multiprocessing
+import queue
+import traceback
+
+from .movie import MovieWriter
+
+_DEFAULT_QUEUE_SIZE = 8
+_POLL_INTERVAL = 0.1
+
+
+def _render_loop(frames, replies, island_map, map_dims, ymax_animals,
+                 cmax_animals, movie_file, movie_fmt, ffmpeg_binary):
+    """
+    Entry point of the rendering process. Messages are handled in the
+    order they were sent until the None message, which closes the movie.
+    Any error is sent back as a formatted traceback and ends the process.
+
+    Parameters
+    ----------
+    frames: multiprocessing.Queue
+        Messages from the simulation
+    replies: multiprocessing.Queue
+        Acknowledgements and errors for the simulation
+    island_map: str
+    map_dims: tuple
+    ymax_animals: int
+    cmax_animals: dict or None
+    movie_file: str or None
+        Name of the movie file, None for no movie
+    movie_fmt: str or None
+    ffmpeg_binary: str
+    """
+    try:
+        # a figure without pyplot, the process never opens a window
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        from .visualisation import Visualisation
+
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        vis = Visualisation(island_map, fig, map_dims, cmax_animals)
+        movie = None
+        if movie_file is not None:
+            movie = MovieWriter(movie_file, movie_fmt, binary=ffmpeg_binary)
+
+        for message in iter(frames.get, None):
+            kind = message[0]
+            if kind == 'setup':
+                vis.visualise_map()
+                vis.animal_graphs(message[1], ymax_animals)
+                vis.animal_dist_graphs()
+                fig.tight_layout()
+            elif kind == 'frame':
+                (year, herb_count, carn_count, herb_dist, carn_dist,
+                 img_name) = message[1:]
+                vis.update_graphs(year, herb_count, carn_count)
+                vis.update_herbivore_dist(herb_dist)
+                vis.update_carnivore_dist(carn_dist)
+                vis.update_year(year)
+                vis.draw()
+                if img_name is not None:
+                    fig.savefig(img_name)
+                if movie is not None:
+                    movie.write_frame(fig, draw=False)
+            elif kind == 'flush':
+                replies.put(('done',))
+        if movie is not None:
+            movie.close()
+        replies.put(('done',))
+    except Exception:
+        replies.put(('error', traceback.format_exc()))
+
+
+class RenderWorker:
+    """
+    Rendering process fed with yearly snapshots of the simulation. Every
+    frame is streamed to the movie, if there is one.
+    """
+
+    def __init__(self, island_map, map_dims, ymax_animals, cmax_animals=None,
+                 movie_file=None, movie_fmt=None, ffmpeg_binary='ffmpeg',
+                 queue_size=_DEFAULT_QUEUE_SIZE):
+        """
+        The constructor for RenderWorker class, starts the process.
+
+        Parameters
+        ----------
+        island_map: str
+        map_dims: tuple
+            Number of rows and columns of the island
+        ymax_animals: int
+            y-axis limit of the population graph
+        cmax_animals: dict or None
+            Color-code limits of the distributions, see Visualisation
+        movie_file: str or None
+            Name of the movie file the frames are streamed to
+        movie_fmt: str or None
+            'mp4' or 'gif'
+        ffmpeg_binary: str
+        queue_size: int
+            Number of snapshots that may wait for rendering
+        """
+        if queue_size < 1:
+            raise ValueError('Queue size must be at least 1')
+        self.queue_size = queue_size
+        self._frames = multiprocessing.Queue(queue_size)
+        self._replies = multiprocessing.Queue()
+        # a daemon, so an unclosed worker does not keep Python running
+        self._process = multiprocessing.Process(
+            target=_render_loop,
+            args=(self._frames, self._replies, island_map, map_dims,
+                  ymax_animals, cmax_animals, movie_file, movie_fmt,
+                  ffmpeg_binary),
+            daemon=True)
+        self._process.start()
+
+    def _put(self, message):
+        """
+        Sends a message, waits while the queue is full.
+
+        Parameters
+        ----------
+        message: tuple or None
+        """
+        while True:
+            try:
+                self._frames.put(message, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                if not self._process.is_alive():
+                    self._wait_reply()
+                    raise RuntimeError('The rendering process has stopped')
+
+    def _wait_reply(self):
+        """
+        Waits for the worker to acknowledge a flush or close.
+        """
+        while True:
+            try:
+                reply = self._replies.get(timeout=_POLL_INTERVAL)
+                break
+            except queue.Empty:
+                if not self._process.is_alive() and self._replies.empty():
+                    self._frames.cancel_join_thread()
+                    raise RuntimeError('The rendering process stopped with '
+                                       'exit code {}'.format(
+                                           self._process.exitcode))
+        if reply[0] == 'error':
+            # nobody reads the frames any more, don't wait for them at exit
+            self._frames.cancel_join_thread()
+            raise RuntimeError('Rendering failed:\n' + reply[1])
+
+    def setup(self, final_year):
+        """
+        Sets up the figure for a simulation up to final_year.
+
+        Parameters
+        ----------
+        final_year: int
+        """
+        self._put(('setup', final_year))
+
+    def render(self, year, counts, distributions, img_name=None):
+        """
+        Queues a frame. The arrays are copied, so the simulation can go on
+        changing its own.
+
+        Parameters
+        ----------
+        year: int
+        counts: dict
+            Number of animals per species
+        distributions: dict
+            Matrix of the number of animals per cell for each species
+        img_name: str or None
+            File the frame is saved to, None for no image file
+        """
+        self._put(('frame', year,
+                   counts['Herbivore'], counts['Carnivore'],
+                   distributions['Herbivore'].copy(),
+                   distributions['Carnivore'].copy(),
+                   img_name))
+
+    def flush(self):
+        """
+        Waits until all queued frames are rendered and saved.
+        """
+        self._put(('flush',))
+        self._wait_reply()
+
+    def close(self):
+        """
+        Renders the queued frames, completes the movie and ends the process.
+        """
+        self._put(None)
+        try:
+            self._wait_reply()
+        finally:
+            self._process.join()
@@ -3,23 +3,26 @@
 """
 simulation class handles calling all visualisations to take the data each step
 of simulation. It also saves data into csv files
+
+Matplotlib, pandas and the Visualisation class are imported the first time
+they are used, so a headless simulation does not load them.
 """
 
 __author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
 __email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
 
+import json
 import os
 import random
+import subprocess
 
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import subprocess
 
 from .fauna import Carnivore, Herbivore
 from .landscapes import Ocean, Savannah, Desert, Jungle, Mountain
 from .map import Map
-from .visualisation import Visualisation
+from .movie import MovieWriter
+from .render import RenderWorker
 
 _FFMPEG_BINARY = 'ffmpeg'
 _CONVERT_BINARY = 'magick'
@@ -43,6 +46,8 @@ class BioSim:
             cmax_animals=None,
             img_base=None,
             img_fmt="png",
+            movie_fmt=None,
+            background_rendering=False,
     ):
         """
         The constructor of BioSim class which contains simulation.
@@ -53,6 +58,12 @@ class BioSim:
         Filenames are formed as
             '{}_{:05d}.{}'.format(img_base, img_no, img_fmt)
         where img_no are consecutive image numbers starting from 0.
+        If movie_fmt is given, the frames are also streamed into ffmpeg,
+        which writes the movie img_base + movie_fmt while the simulation
+        runs. Image files are then only needed if img_fmt is not None.
+        With background_rendering, the frames to be saved are drawn in a
+        separate process while the simulation goes on, and no figure is
+        shown on screen.
 
         Parameters
         ----------
@@ -61,15 +72,19 @@ class BioSim:
         ini_pop: list
             List of dictionaries specifying initial population
         seed: int
-            Used as random number seed
+            Used as seed of the random number generator of the simulation
         ymax_animals: int
             Specifying y-axis limit for graph showing animal numbers
         cmax_animals: dict
             Specifying color-code limits for animal densities
         img_base: str
             String with beginning of file name for figures, including path
-        img_fmt: str
-            String with file type for figures
+        img_fmt: str or None
+            String with file type for figures, None for no image files
+        movie_fmt: str or None
+            'mp4' or 'gif' to stream the frames into a movie
+        background_rendering: bool
+            Render and save the frames in a separate process
         """
 
         self._landscapes = {'O': Ocean,
@@ -90,10 +105,10 @@ class BioSim:
         if len(set(lengths)) > 1:
             raise ValueError('This given string is not uniform')
 
-        np.random.seed(seed)
+        self._rng = np.random.default_rng(seed)
 
         self._island_map = island_map
-        self._map = Map(island_map)
+        self._map = Map(island_map, rng=self._rng)
 
         self._vis = None
         self.add_population(ini_pop)
@@ -103,10 +118,9 @@ class BioSim:
         else:
             self.ymax_animals = ymax_animals
 
-        if cmax_animals is None:
-            self._cmax_animals = {'Herbivore': 5, 'Carnivore': 5}
-        else:
-            self._cmax_animals = cmax_animals
+        self._cmax_animals = {'Herbivore': 5, 'Carnivore': 5}
+        if cmax_animals is not None:
+            self._cmax_animals.update(cmax_animals)
 
         if img_base is None:
             self._img_base = _DEFAULT_GRAPHICS_DIR + _DEFAULT_GRAPHICS_NAME
@@ -114,14 +128,22 @@ class BioSim:
             self._img_base = img_base
         self._img_ctr = 0
         self._img_fmt = img_fmt
+        if movie_fmt is not None and movie_fmt not in ('mp4', 'gif'):
+            raise ValueError('Unknown movie format: ' + movie_fmt)
+        self._movie_fmt = movie_fmt
+        self._movie = None
+        self._background_rendering = background_rendering
+        self._renderer = None
 
         self._year = 0
         self._final_year = None
         self._fig = None
+        self._history = {'Year': [], 'Herbivore': [], 'Carnivore': []}
 
     def set_animal_parameters(self, species, params):
         """
-        Sets parameters for animal species.
+        Sets parameters for animal species. The parameters only apply to
+        this simulation.
 
         Parameters
         ----------
@@ -131,16 +153,15 @@ class BioSim:
             With valid parameter specification for species
         """
         if species in self._animal_species:
-            species_class = self._animal_species[species]
-            animal = species_class()
-            animal.set_given_parameters(params)
+            self._map.set_animal_parameters(species, params)
         else:
             raise TypeError(species + ' parameters can\'t be assigned, '
                                       'there is no such data type')
 
     def set_landscape_parameters(self, landscape, params):
         """
-        Sets parameters for landscape type.
+        Sets parameters for landscape type. The parameters only apply to
+        this simulation.
 
         Parameters
         ----------
@@ -153,7 +174,7 @@ class BioSim:
             landscape_class = self._landscapes[landscape]
             if landscape_class in \
                     self._landscapes_with_changable_parameters:
-                landscape_class.set_given_parameters(params)
+                self._map.set_landscape_parameters(landscape, params)
             else:
                 raise ValueError(landscape + ' parameters is not valid')
 
@@ -165,40 +186,54 @@ class BioSim:
         """
         Runs simulation while visualizing the result.
         Image files will be numbered consecutively.
+        With vis_years and img_years both None the simulation runs headless:
+        matplotlib is never used and nothing is printed, the number of
+        animals per species is only recorded in population_history.
 
         Parameters
         ----------
         num_years: int
             Number of years to simulate
-        vis_years: int
-            Years between visualization updates
-        img_years: int
+        vis_years: int or None
+            Years between visualization updates, None for no updates
+        img_years: int or None
             Years between visualizations saved to files (default: vis_years)
         """
         if img_years is None:
             img_years = vis_years
+        headless = vis_years is None and img_years is None
 
         self._final_year = self._year + num_years
-        self._setup_graphics()
+        if not headless:
+            self._setup_graphics()
 
         while self._year < self._final_year:
 
-            if self._year % vis_years == 0:
-                self._update_graphics()
-
-            if self._year % img_years == 0:
-                self._save_graphics()
+            update = vis_years is not None and self._year % vis_years == 0
+            save = img_years is not None and self._year % img_years == 0
+            if self._background_rendering:
+                if save:
+                    self._render_in_background()
+            else:
+                if update or save:
+                    self._update_graphics()
+                if save:
+                    self._save_graphics()
 
             self._map.life_cycle()
             self._year += 1
+            self._record_population()
 
-            print("Year "+str(self._year))
-            print(self.num_animals_per_species)
+            if not headless:
+                print("Year "+str(self._year))
+                print(self.num_animals_per_species)
 
+        if self._renderer is not None:
+            self._renderer.flush()
         # self._save_to_csv()
 
     def _save_to_csv(self):
-        df = self._animal_distribution
+        df = self.animal_distribution
         df.to_csv('../results/data.csv', sep='\t', encoding='utf-8')
 
     def _setup_graphics(self):
@@ -207,9 +242,27 @@ class BioSim:
         """
         map_dims = self._map.cells_dims
 
+        if self._background_rendering:
+            if self._renderer is None:
+                movie_file = None
+                if self._movie_fmt is not None:
+                    movie_file = '{}.{}'.format(self._img_base,
+                                                self._movie_fmt)
+                self._renderer = RenderWorker(
+                    self._island_map, map_dims, self.ymax_animals,
+                    self._cmax_animals, movie_file, self._movie_fmt,
+                    _FFMPEG_BINARY)
+            self._renderer.setup(self._final_year)
+            return
+
+        import matplotlib.pyplot as plt
+        from .visualisation import Visualisation
+
         if self._fig is None:
             self._fig = plt.figure()
-            self._vis = Visualisation(self._island_map, self._fig, map_dims)
+            self._vis = Visualisation(self._island_map, self._fig, map_dims,
+                                      self._cmax_animals)
+            plt.show(block=False)
 
         self._vis.visualise_map()
         self._vis.animal_graphs(self._final_year, self.ymax_animals)
@@ -221,15 +274,13 @@ class BioSim:
         """
         Updates graphics with current data.
         """
-        df = self._animal_distribution
-        rows, cols = self._map.cells_dims
-        dist_matrix_carnivore = np.array(df[['Carnivore']]).reshape(rows, cols)
-        dist_matrix_herbivore = np.array(df[['Herbivore']]).reshape(rows, cols)
+        dist_matrix_carnivore = self._map.num_animals_per_cell('Carnivore')
+        dist_matrix_herbivore = self._map.num_animals_per_cell('Herbivore')
         self._update_animals_graph()
         self._vis.update_herbivore_dist(dist_matrix_herbivore)
         self._vis.update_carnivore_dist(dist_matrix_carnivore)
-        plt.pause(1e-6)
-        self._fig.suptitle('Year: ' + str(self.year), x=0.5)
+        self._vis.update_year(self.year)
+        self._vis.draw()
 
     def _save_graphics(self):
         """
@@ -239,9 +290,34 @@ class BioSim:
         if self._img_base is None:
             return
 
-        plt.savefig('{base}_{num:05d}.{type}'.format(base=self._img_base,
-                                                     num=self._img_ctr,
-                                                     type=self._img_fmt))
+        if self._movie_fmt is not None:
+            if self._movie is None:
+                self._movie = MovieWriter(
+                    '{}.{}'.format(self._img_base, self._movie_fmt),
+                    self._movie_fmt, binary=_FFMPEG_BINARY)
+            # the canvas holds the frame drawn by _update_graphics
+            self._movie.write_frame(self._fig, draw=False)
+
+        if self._img_fmt is not None:
+            import matplotlib.pyplot as plt
+
+            plt.savefig('{base}_{num:05d}.{type}'.format(
+                base=self._img_base, num=self._img_ctr, type=self._img_fmt))
+        self._img_ctr += 1
+
+    def _render_in_background(self):
+        """
+        Sends the current year to the rendering process, which saves it
+        like _save_graphics.
+        """
+        img_name = None
+        if self._img_fmt is not None:
+            img_name = '{base}_{num:05d}.{type}'.format(
+                base=self._img_base, num=self._img_ctr, type=self._img_fmt)
+        distributions = {species: self._map.num_animals_per_cell(species)
+                         for species in ('Herbivore', 'Carnivore')}
+        self._renderer.render(self._year, self.num_animals_per_species,
+                              distributions, img_name)
         self._img_ctr += 1
 
     def add_population(self, population):
@@ -255,10 +331,85 @@ class BioSim:
         """
         self._map.add_animals(population)
 
+    def save_checkpoint(self, path):
+        """
+        Saves the full state of the simulation to one compressed NumPy
+        .npz file: the island map, the fodder of every cell, the age,
+        weight, fitness and cell of every animal, the parameters of the
+        simulation, the year, the population history and the state of the
+        random number generator. A simulation restored with load_checkpoint
+        continues exactly as this simulation would.
+
+        Parameters
+        ----------
+        path: str
+            File name; '.npz' is appended if missing
+        """
+        history = {'history_' + key: values for key, values in
+                   self.population_history.items()}
+        np.savez_compressed(
+            self._checkpoint_path(path),
+            island_map=np.array(self._island_map),
+            year=np.array(self._year),
+            img_ctr=np.array(self._img_ctr),
+            parameters=np.array(json.dumps(self._map.parameters)),
+            rng_state=np.array(json.dumps(self._rng.bit_generator.state)),
+            **history,
+            **self._map.state_arrays())
+
+    @staticmethod
+    def _checkpoint_path(path):
+        """
+        Checkpoint file name, with the '.npz' suffix np.savez adds.
+
+        Parameters
+        ----------
+        path: str
+
+        Returns
+        -------
+        path: str
+        """
+        path = os.fspath(path)
+        if not path.endswith('.npz'):
+            path += '.npz'
+        return path
+
+    @classmethod
+    def load_checkpoint(cls, path, **kwargs):
+        """
+        Creates a simulation from a file written by save_checkpoint.
+
+        Parameters
+        ----------
+        path: str
+            File name; '.npz' is appended if missing
+        kwargs:
+            Other arguments for the constructor, e.g. img_base
+
+        Returns
+        -------
+        sim: BioSim
+        """
+        with np.load(cls._checkpoint_path(path),
+                     allow_pickle=False) as checkpoint:
+            sim = cls(str(checkpoint['island_map']), [], seed=0, **kwargs)
+            sim._map.restore_state(checkpoint,
+                                   json.loads(str(checkpoint['parameters'])))
+            sim._rng.bit_generator.state = json.loads(
+                str(checkpoint['rng_state']))
+            sim._year = int(checkpoint['year'])
+            sim._img_ctr = int(checkpoint['img_ctr'])
+            for key in sim._history:
+                sim._history[key] = checkpoint['history_' + key].tolist()
+        return sim
+
     def make_movie(self, movie_fmt=_DEFAULT_MOVIE_FORMAT):
         """
         Creates MPEG4 movie from visualization images saved, requires ffmpeg.
         The movie is stored as img_base + movie_fmt
+        If the frames were streamed into a movie of this format, the stream
+        is closed instead, so the movie is complete when this returns.
 
         Parameters
         ----------
@@ -268,6 +419,17 @@ class BioSim:
         if self._img_base is None:
             raise RuntimeError("No filename defined.")
 
+        if self._renderer is not None:
+            renderer, self._renderer = self._renderer, None
+            renderer.close()
+            if self._movie_fmt == movie_fmt:
+                return
+
+        if self._movie is not None and self._movie.movie_fmt == movie_fmt:
+            movie, self._movie = self._movie, None
+            movie.close()
+            return
+
         if movie_fmt == 'mp4':
             try:
                 """ Parameters chosen according to 
@@ -299,8 +461,9 @@ class BioSim:
             raise ValueError('Unknown movie format: ' + movie_fmt)
 
     def _update_animals_graph(self):
-        herb_count, carn_count = list(self.num_animals_per_species.values())
-        self._vis.update_graphs(self._year, herb_count, carn_count)
+        counts = self.num_animals_per_species
+        self._vis.update_graphs(self._year, counts['Herbivore'],
+                                counts['Carnivore'])
 
     @property
     def year(self):
@@ -309,6 +472,27 @@ class BioSim:
         """
         return self._year
 
+    def _record_population(self):
+        """
+        Records the number of animals per species at the end of the year.
+        """
+        self._history['Year'].append(self._year)
+        for species, num_animals in self.num_animals_per_species.items():
+            self._history[species].append(num_animals)
+
+    @property
+    def population_history(self):
+        """
+        Number of animals per species at the end of every simulated year.
+
+        Returns
+        -------
+        history: dict
+            Arrays of the years and of the counts of each species
+        """
+        return {key: np.array(values, dtype=int) for key, values in
+                self._history.items()}
+
     @property
     def num_animals(self):
         """
@@ -339,22 +523,22 @@ class BioSim:
         return num_per_species
 
     @property
-    def _animal_distribution(self):
+    def animal_distribution(self):
         """
-        Calculates Pandas DataFrame with animal count per species for each cell
-        on island.
+        Pandas DataFrame with animal count per species for each cell on
+        island. It is built from the count matrices kept by the map, so it
+        is only needed for export; the simulation loop reads the matrices.
 
         Returns
         -------
         pd.DataFrame(count_df): data frame
         """
-        count_df = []
+        import pandas as pd
+
         rows, cols = self._map.cells_dims
-        for i in range(rows):
-            for j in range(cols):
-                cell = self._map.cells[i, j]
-                animals_count = cell.cell_fauna_count
-                count_df.append({'Row': i, 'Col': j,
-                                 'Herbivore': animals_count['Herbivore'],
-                                 'Carnivore': animals_count['Carnivore']})
+        row_index, col_index = np.indices((rows, cols))
+        count_df = {'Row': row_index.ravel(), 'Col': col_index.ravel()}
+        for species in ('Herbivore', 'Carnivore'):
+            count_df[species] = self._map.num_animals_per_cell(
+                species).ravel()
         return pd.DataFrame(count_df)
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parameter sweeps for calibrating the model. A parameter space is turned into
+a list of parameter points, by a full grid or by Latin hypercube sampling,
+and every point is simulated for the given seeds in a pool of worker
+processes. Each (point, seed) result is cached on disk under a hash of the
+island, initial population, parameters, seed and number of years, so
+running an extended sweep again only simulates the new points.
+
+A parameter point has the format of ensemble.apply_parameters, e.g.
+{'Herbivore': {'F': 20.0}, 'S': {'alpha': 0.5}}. A parameter space maps
+(key, parameter name) pairs to the values to try, e.g.
+{('Herbivore', 'F'): [10.0, 20.0], ('J', 'f_max'): [300.0, 800.0]}.
+"""
+
+__author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
+__email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
+import itertools
+import json
+import os
+
+import numpy as np
+
+from .ensemble import _simulate_seed, apply_parameters
+from .map import Map
+
+
+def _point(names, values):
+    """
+    Builds a parameter point from (key, parameter name) pairs and values.
+
+    Parameters
+    ----------
+    names: list of tuple
+    values: iterable
+
+    Returns
+    -------
+    point: dict
+    """
+    point = {}
+    for (key, parameter), value in zip(names, values):
+        point.setdefault(key, {})[parameter] = value
+    return point
+
+
+def grid(space):
+    """
+    All combinations of the values of a parameter space.
+
+    Parameters
+    ----------
+    space: dict
+        Values to try for each (key, parameter name) pair
+
+    Returns
+    -------
+    points: list of dict
+    """
+    names = list(space)
+    return [_point(names, values)
+            for values in itertools.product(*space.values())]
+
+
+def latin_hypercube(bounds, num_points, seed=None):
+    """
+    Latin hypercube sample of a parameter space: the range of every
+    parameter is split into num_points equal strata, and every stratum is
+    used by exactly one point.
+
+    Parameters
+    ----------
+    bounds: dict
+        (low, high) range for each (key, parameter name) pair
+    num_points: int
+    seed: int
+
+    Returns
+    -------
+    points: list of dict
+    """
+    rng = np.random.default_rng(seed)
+    names = list(bounds)
+    samples = np.empty((num_points, len(names)))
+    for j, name in enumerate(names):
+        low, high = bounds[name]
+        strata = rng.permutation(num_points)
+        samples[:, j] = low + (high - low) * (
+            strata + rng.random(num_points)) / num_points
+    return [_point(names, row) for row in samples.tolist()]
+
+
+def cache_key(island_map, ini_pop, params, seed, years):
+    """
+    Hash identifying the result of one simulation. Spaces in the island
+    map are ignored, as they are by the Map.
+
+    Parameters
+    ----------
+    island_map: str
+    ini_pop: list
+    params: dict
+    seed: int
+    years: int
+
+    Returns
+    -------
+    key: str
+        Hexadecimal SHA-256 digest
+    """
+    description = json.dumps({'island_map': island_map.replace(' ', ''),
+                              'ini_pop': ini_pop,
+                              'params': params,
+                              'seed': seed,
+                              'years': years},
+                             sort_keys=True, default=_to_builtin)
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+
+def _to_builtin(value):
+    """
+    Converts NumPy scalars for the JSON encoder.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('Can\'t hash value of type ' + type(value).__name__)
+
+
+class ResultCache:
+    """
+    Directory with one .npy file of animal counts per simulation, named by
+    the cache key of the simulation.
+    """
+
+    def __init__(self, directory):
+        """
+        The constructor for ResultCache class.
+
+        Parameters
+        ----------
+        directory: str
+            Created if it does not exist
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def load(self, key):
+        """
+        Parameters
+        ----------
+        key: str
+
+        Returns
+        -------
+        counts: np.ndarray or None
+            None if the result is not cached
+        """
+        if key not in self:
+            return None
+        return np.load(self.path(key))
+
+    def save(self, key, counts):
+        """
+        Stores a result. The file is written under a temporary name first,
+        so an interrupted sweep never leaves a broken result behind.
+
+        Parameters
+        ----------
+        key: str
+        counts: np.ndarray
+        """
+        tmp_path = self.path(key) + '.tmp'
+        with open(tmp_path, 'wb') as tmp_file:
+            np.save(tmp_file, counts)
+        os.replace(tmp_path, self.path(key))
+
+
+class SweepResult:
+    """
+    Animal counts of a sweep, stacked as (point, seed, year, species).
+    """
+
+    def __init__(self, points, seeds, counts, num_computed):
+        """
+        The constructor for SweepResult class.
+
+        Parameters
+        ----------
+        points: list of dict
+        seeds: list of int
+        counts: np.ndarray
+        num_computed: int
+            Number of simulations that were not in the cache
+        """
+        self.points = points
+        self.seeds = seeds
+        self.counts = counts
+        self.num_computed = num_computed
+
+    def mean(self):
+        """
+        Mean count over the seeds for every point, year and species.
+
+        Returns
+        -------
+        mean: np.ndarray
+            Array of shape (number of points, years + 1, number of species)
+        """
+        return self.counts.mean(axis=1)
+
+
+def run(island_map, ini_pop, points, seeds, years, cache_dir, workers=None):
+    """
+    Simulates every parameter point for every seed. Cached results are
+    loaded, the others are simulated in a pool of worker processes and
+    cached as soon as they are done. With workers=1 they are simulated in
+    the calling process.
+
+    Parameters
+    ----------
+    island_map: str
+    ini_pop: list
+    points: list of dict
+        Parameter points, see grid and latin_hypercube
+    seeds: iterable of int
+    years: int
+    cache_dir: str
+    workers: int
+        Number of worker processes, the number of CPUs if None
+
+    Returns
+    -------
+    result: SweepResult
+    """
+    seeds = list(seeds)
+    cache = ResultCache(cache_dir)
+    results = {}
+    tasks = {}
+    for point in points:
+        num_tasks = len(tasks)
+        for seed in seeds:
+            key = cache_key(island_map, ini_pop, point, seed, years)
+            counts = cache.load(key)
+            if counts is not None:
+                results[key] = counts
+            elif key not in tasks:
+                tasks[key] = (island_map, ini_pop, seed, years, point)
+        if len(tasks) > num_tasks:
+            # fail early on an invalid island or invalid parameters
+            apply_parameters(Map(island_map), point)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        for key, task in tasks.items():
+            results[key] = _simulate_seed(task)
+            cache.save(key, results[key])
+    elif len(tasks) > 0:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_simulate_seed, task): key
+                       for key, task in tasks.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                results[key] = future.result()
+                cache.save(key, results[key])
+
+    counts = np.array([[results[cache_key(island_map, ini_pop, point, seed,
+                                          years)]
+                        for seed in seeds] for point in points])
+    return SweepResult(points, seeds, counts, len(tasks))
@@ -3,13 +3,17 @@
 """
 Visualisation class handles the setup of all graph and heatmap to
 show the simulated data each year.
+
+Only the population curves, the distribution images and the year change
+from one year to the next. They are drawn as animated artists on top of a
+cached background with the island map, axes and labels, and only they are
+redrawn and blitted for every update.
 """
 
 __author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
 __email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
 
 import matplotlib.colors as mcolors
-import matplotlib.pyplot as plt
 import numpy as np
 
 
@@ -32,7 +36,7 @@ class Visualisation:
         "M": "Mountain",
     }
 
-    def __init__(self, map_layout, figure, map_dims):
+    def __init__(self, map_layout, figure, map_dims, cmax_animals=None):
         """
         The constructor for the Visualisation class.
 
@@ -41,9 +45,13 @@ class Visualisation:
         map_layout: str
         figure: matplotlib figure
         map_dims: int
+        cmax_animals: dict or None
+            Upper color-code limit of the distribution of each species, the
+            color scale follows the counts of every update if None
         """
         self._map_layout = map_layout
         self._fig = figure
+        self._cmax_animals = cmax_animals
         self._map_colors = Visualisation.map_colors
         self._map_dims = map_dims
         self._mean_ax = None
@@ -54,6 +62,11 @@ class Visualisation:
         self._carnivore_dist = None
         self._herbivore_img_axis = None
         self._carnivore_img_axis = None
+        self._year_text = None
+        self._blit = figure.canvas.supports_blit
+        self._background = None
+        if self._blit:
+            figure.canvas.mpl_connect('draw_event', self._on_draw)
 
     def generate_map_array(self):
         """
@@ -111,7 +124,8 @@ class Visualisation:
         """
         if self._carnivore_curve is None:
             plot = self._mean_ax.plot(np.arange(0, final_year),
-                                      np.full(final_year, np.nan))
+                                      np.full(final_year, np.nan),
+                                      animated=self._blit)
             self._carnivore_curve = plot[0]
         else:
             xdata, ydata = self._carnivore_curve.get_data()
@@ -132,7 +146,8 @@ class Visualisation:
         """
         if self._herbivore_curve is None:
             plot = self._mean_ax.plot(np.arange(0, final_year),
-                                      np.full(final_year, np.nan))
+                                      np.full(final_year, np.nan),
+                                      animated=self._blit)
             self._herbivore_curve = plot[0]
         else:
             xdata, ydata = self._herbivore_curve.get_data()
@@ -160,7 +175,80 @@ class Visualisation:
         carn_ydata = self._carnivore_curve.get_ydata()
         carn_ydata[year] = carn_count
         self._carnivore_curve.set_ydata(carn_ydata)
-        plt.pause(1e-4)
+
+    def update_year(self, year):
+        """
+        Updates the year shown on top of the figure.
+
+        Parameters
+        ----------
+        year: int
+        """
+        if self._year_text is None:
+            # the text belongs to the population axes, so it is still drawn
+            # when the figure is saved, but is placed like a figure title
+            self._year_text = self._mean_ax.text(
+                0.5, 0.98, '', transform=self._fig.transFigure,
+                ha='center', va='top', size='large', animated=self._blit)
+            self._year_text.set_in_layout(False)
+        self._year_text.set_text('Year: ' + str(year))
+
+    def _animated_artists(self):
+        """
+        Artists that change every year.
+
+        Returns
+        -------
+        artists: list
+        """
+        artists = [self._herbivore_curve, self._carnivore_curve,
+                   self._herbivore_img_axis, self._carnivore_img_axis,
+                   self._year_text]
+        return [artist for artist in artists if artist is not None]
+
+    def _draw_animated(self):
+        """
+        Draws the animated artists. The spines of their axes are drawn
+        again on top, as in a full redraw of the figure.
+        """
+        axes = []
+        for artist in self._animated_artists():
+            self._fig.draw_artist(artist)
+            if artist.axes not in axes:
+                axes.append(artist.axes)
+        for ax in axes:
+            for spine in ax.spines.values():
+                self._fig.draw_artist(spine)
+
+    def _on_draw(self, event):
+        """
+        Caches the background after every full redraw of the figure, e.g.
+        when the window is resized, and draws the animated artists on top.
+        Redraws for saving the figure already contain the animated artists.
+
+        Parameters
+        ----------
+        event: matplotlib DrawEvent
+        """
+        if self._fig.canvas.is_saving():
+            return
+        self._background = self._fig.canvas.copy_from_bbox(self._fig.bbox)
+        self._draw_animated()
+
+    def draw(self):
+        """
+        Shows the updated curves, distributions and year. Only the animated
+        artists are redrawn on the cached background; the whole figure is
+        redrawn if the background is out of date or the canvas can't blit.
+        """
+        canvas = self._fig.canvas
+        if self._background is None:
+            canvas.draw()
+        else:
+            canvas.restore_region(self._background)
+            self._draw_animated()
+            canvas.blit(self._fig.bbox)
+        canvas.flush_events()
 
     def animal_graphs(self, final_year, y_lim):
         """
@@ -175,6 +263,7 @@ class Visualisation:
             self._mean_ax = self._fig.add_subplot(2, 2, 2)
             self._mean_ax.set_ylim(0, y_lim)
         self._mean_ax.set_xlim(0, final_year+1)
+        self._background = None
         self._build_herb_sim_curve(final_year)
         self._build_carn_sim_curve(final_year)
         self._mean_ax.set_title('Animals population')
@@ -194,6 +283,24 @@ class Visualisation:
             self._carnivore_dist = self._fig.add_subplot(2, 2, 4)
             self._carnivore_img_axis = None
 
+    def _color_limits(self, species, distribution):
+        """
+        Color-code limits of a distribution image: from 0 to the limit
+        given for the species, or from the lowest to the highest count.
+
+        Parameters
+        ----------
+        species: str
+        distribution: np.ndarray
+
+        Returns
+        -------
+        limits: tuple
+        """
+        if self._cmax_animals is not None:
+            return 0, self._cmax_animals[species]
+        return distribution.min(), distribution.max()
+
     def update_herbivore_dist(self, distribution):
         """
         Updates herbivores distribution.
@@ -202,15 +309,17 @@ class Visualisation:
         ----------
         distribution: data frame
         """
-        v_max = distribution.max()
-        v_min = distribution.min()
         if self._herbivore_img_axis is not None:
             self._herbivore_img_axis.set_data(distribution)
+            self._herbivore_img_axis.set_clim(
+                self._color_limits('Herbivore', distribution))
         else:
             y, x = self._map_dims
-            self._herbivore_dist.imshow(distribution,
-                                        interpolation='nearest',
-                                        vmin=v_min, vmax=v_max)
+            v_min, v_max = self._color_limits('Herbivore', distribution)
+            self._herbivore_img_axis = self._herbivore_dist.imshow(
+                distribution, interpolation='nearest',
+                vmin=v_min, vmax=v_max, animated=self._blit)
+            self._background = None
             self._herbivore_dist.set_xticks(range(0, x, 5))
             self._herbivore_dist.set_xticklabels(range(0, x, 5))
             self._herbivore_dist.set_yticks(range(0, y, 5))
@@ -227,15 +336,17 @@ class Visualisation:
         ----------
         distribution: str
         """
-        v_max = distribution.max()
-        v_min = distribution.min()
         if self._carnivore_img_axis is not None:
             self._carnivore_img_axis.set_data(distribution)
+            self._carnivore_img_axis.set_clim(
+                self._color_limits('Carnivore', distribution))
         else:
             y, x = self._map_dims
-            self._carnivore_dist.imshow(distribution,
-                                        interpolation='nearest',
-                                        vmin=v_min, vmax=v_max)
+            v_min, v_max = self._color_limits('Carnivore', distribution)
+            self._carnivore_img_axis = self._carnivore_dist.imshow(
+                distribution, interpolation='nearest',
+                vmin=v_min, vmax=v_max, animated=self._blit)
+            self._background = None
             self._carnivore_dist.set_xticks(range(0, x, 5))
             self._carnivore_dist.set_xticklabels(range(0, x, 5))
             self._carnivore_dist.set_yticks(range(0, y, 5))
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fixtures shared by several test files.
+
+"""
+
+__author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
+__email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
+
+import os
+import stat
+import sys
+
+import pytest
+
+FAKE_FFMPEG = """#!{python}
+import shutil, sys
+with open(sys.argv[-1], 'wb') as movie:
+    shutil.copyfileobj(sys.stdin.buffer, movie)
+"""
+
+
+@pytest.fixture
+def fake_ffmpeg(tmpdir):
+    """
+    Stand-in for ffmpeg: a small script that copies its standard input,
+    the raw frames, to the movie file.
+
+    Returns
+    -------
+    path: str
+    """
+    path = str(tmpdir.join('ffmpeg'))
+    with open(path, 'w') as script:
+        script.write(FAKE_FFMPEG.format(python=sys.executable))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test set for the ensemble runner.
+
+"""
+
+__author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
+__email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
+
+import pytest
+import numpy as np
+
+from biosim import ensemble
+from biosim.map import Map
+
+
+class TestEnsemble:
+    """
+    This set of tests checks the ensemble runner gives the trajectories of
+    the single simulations, stacked as (seed, year, species).
+    """
+    @pytest.fixture
+    def gen_ensemble_data(self):
+        """
+        Small island with herbivores and carnivores.
+
+        Returns
+        -------
+        island_map: str
+        ini_pop: list
+        """
+        island_map = """OOOOO
+                        OJJSO
+                        OJDJO
+                        OOOOO"""
+        ini_pop = [{'loc': (1, 1),
+                    'pop': [{'species': 'Herbivore', 'age': 5,
+                             'weight': 20.0} for _ in range(30)]
+                    + [{'species': 'Carnivore', 'age': 5,
+                        'weight': 20.0} for _ in range(5)]}]
+        return island_map, ini_pop
+
+    def test_shape_and_summaries(self, gen_ensemble_data):
+        island_map, ini_pop = gen_ensemble_data
+        result = ensemble.run(island_map, ini_pop, seeds=[1, 2, 3], years=5,
+                              workers=1)
+        assert result.counts.shape == (3, 6, 2)
+        assert list(result.counts[:, 0, 0]) == [30, 30, 30]
+        assert list(result.counts[:, 0, 1]) == [5, 5, 5]
+        assert result.mean().shape == (6, 2)
+        assert result.quantiles([0.1, 0.9]).shape == (2, 6, 2)
+        assert np.array_equal(result.species_counts('Carnivore'),
+                              result.counts[:, :, 1])
+
+    def test_matches_single_run(self, gen_ensemble_data):
+        island_map, ini_pop = gen_ensemble_data
+        params = {'Herbivore': {'omega': 0.2}, 'J': {'f_max': 500.0}}
+        result = ensemble.run(island_map, ini_pop, seeds=[7], years=4,
+                              params=params, workers=1)
+        island = Map(island_map, rng=np.random.default_rng(7))
+        island.set_animal_parameters('Herbivore', {'omega': 0.2})
+        island.set_landscape_parameters('J', {'f_max': 500.0})
+        island.add_animals(ini_pop)
+        for _ in range(4):
+            island.life_cycle()
+        assert result.counts[0, -1, 0] == \
+            island.total_num_animals_per_species('Herbivore')
+        assert result.counts[0, -1, 1] == \
+            island.total_num_animals_per_species('Carnivore')
+
+    def test_process_pool(self, gen_ensemble_data):
+        island_map, ini_pop = gen_ensemble_data
+        serial = ensemble.run(island_map, ini_pop, seeds=range(4), years=3,
+                              workers=1)
+        pooled = ensemble.run(island_map, ini_pop, seeds=range(4), years=3,
+                              workers=2)
+        assert np.array_equal(serial.counts, pooled.counts)
+
+    def test_invalid_parameters(self, gen_ensemble_data):
+        island_map, ini_pop = gen_ensemble_data
+        with pytest.raises(RuntimeError):
+            ensemble.run(island_map, ini_pop, seeds=[1], years=1,
+                         params={'Herbivore': {'unknown': 1}}, workers=1)
@@ -251,3 +251,176 @@ class TestCarnivores(TestFauna):
         carn = Carnivore(weight=10)
         herb = Herbivore(weight=100)
         assert not carn.kill_prob(herb)
+
+
+class TestBatchFitness:
+    """
+    The batch fitness kernel gives the same numbers as the scalar formula.
+    """
+    def test_batch_matches_scalar(self):
+        ages = np.array([0, 3, 10, 45, 80])
+        weights = np.array([0.0, 2.5, 12.0, 30.0, 7.0])
+        for species_class in (Herbivore, Carnivore):
+            fitness = species_class.batch_fitness(ages, weights,
+                                                  species_class.parameters)
+            for age, weight, phi in zip(ages, weights, fitness):
+                animal = species_class(age=int(age), weight=float(weight))
+                assert phi == pytest.approx(animal.fitness)
+
+    def test_update_fitness_batch(self):
+        herbs = [Herbivore(age=a, weight=20.0) for a in range(5)]
+        for herb in herbs:
+            herb.eat(10)
+        Herbivore.update_fitness_batch(herbs)
+        for herb in herbs:
+            assert herb.fitness == pytest.approx(Herbivore._fitness_formula(
+                herb.age, herb.weight, Herbivore.parameters))
+
+    def test_non_positive_weight_fitness(self):
+        herb = Herbivore(age=5, weight=20.0)
+        for weight in [0.0, -1.0]:
+            herb._weight = weight
+            herb.calculate_fitness()
+            fitness = Herbivore.batch_fitness([5], [weight],
+                                              Herbivore.parameters)
+            assert herb.fitness == fitness[0] == 0
+
+
+class TestRandomGenerator:
+    """
+    Animals draw all random numbers from the generator they are given.
+    """
+    def test_default_weight_from_generator(self):
+        herb_1 = Herbivore(rng=np.random.default_rng(5))
+        herb_2 = Herbivore(rng=np.random.default_rng(5))
+        assert herb_1.weight == herb_2.weight
+
+    def test_draws_from_generator(self):
+        rng = np.random.default_rng(5)
+        carn = Carnivore(age=2, weight=30.0, rng=rng)
+        reference = np.random.default_rng(5)
+        expected = carn.parameters['mu'] * carn.fitness > reference.random()
+        assert carn.move_prob == expected
+
+
+class TestBirthBatch:
+    """
+    The batch birth kernel follows the rules of birth_prob and
+    lose_weight_give_birth.
+    """
+    @pytest.fixture
+    def birth_params(self):
+        params = dict(Herbivore.parameters)
+        params.update({'gamma': 100.0, 'zeta': 1.0, 'w_birth': 8.0,
+                       'sigma_birth': 1.0, 'xi': 1.2})
+        return Herbivore.compile_parameters(params)
+
+    def test_eligible_mothers_give_birth(self, birth_params):
+        weights = np.array([50.0, 5.0, 40.0])
+        fitness = np.array([0.5, 0.5, 0.5])
+        mothers, baby_weights = Herbivore.give_birth_batch(
+            weights, fitness, 10, birth_params, np.random.default_rng(3))
+        assert list(mothers) == [0, 2]
+        assert len(baby_weights) == 2
+        assert np.all(weights[mothers] >= birth_params['xi'] * baby_weights)
+
+    def test_birth_threshold(self, birth_params):
+        params = birth_params.as_dict()
+        params['xi'] = 0.0
+        snapshot = Herbivore.compile_parameters(params)
+        weights = np.array([snapshot.birth_threshold - 0.1,
+                            snapshot.birth_threshold])
+        mothers, _ = Herbivore.give_birth_batch(
+            weights, np.array([0.9, 0.9]), 10, snapshot,
+            np.random.default_rng(3))
+        assert list(mothers) == [1]
+
+    def test_no_birth_alone(self, birth_params):
+        mothers, baby_weights = Herbivore.give_birth_batch(
+            np.array([50.0]), np.array([0.9]), 1, birth_params,
+            np.random.default_rng(3))
+        assert len(mothers) == 0
+        assert len(baby_weights) == 0
+
+    def test_baby_weights_gaussian(self, birth_params):
+        weights = np.full(5000, 100.0)
+        fitness = np.full(5000, 0.9)
+        mothers, baby_weights = Herbivore.give_birth_batch(
+            weights, fitness, 2, birth_params, np.random.default_rng(4))
+        assert len(mothers) == 5000
+        assert baby_weights.mean() == pytest.approx(8.0, abs=0.1)
+        assert baby_weights.std() == pytest.approx(1.0, abs=0.1)
+
+
+class TestCompactInstances:
+    """
+    Tests for the __slots__ based representation of the animals.
+    """
+    @pytest.mark.parametrize('species_class', [Herbivore, Carnivore])
+    def test_no_instance_dict(self, species_class):
+        animal = species_class(age=3, weight=20.0)
+        assert not hasattr(animal, '__dict__')
+        with pytest.raises(AttributeError):
+            animal.just_give_birth = True
+
+    def test_fitness_cache_reset(self):
+        herb = Herbivore(age=3, weight=20.0)
+        fitness = herb.fitness
+        herb.eat(10)
+        assert herb.fitness > fitness
+
+    def test_lose_weight_give_birth_returns_flag(self):
+        mother = Herbivore(age=3, weight=40.0)
+        assert mother.lose_weight_give_birth(Herbivore(weight=8.0))
+        assert mother.weight == pytest.approx(40.0 - 8.0 * 1.2)
+        assert not mother.lose_weight_give_birth(Herbivore(weight=50.0))
+
+
+class TestAgeTable:
+    """
+    Tests for the precomputed age term of the fitness formula.
+    """
+    @pytest.fixture(autouse=True)
+    def restore_parameters(self):
+        default = dict(Herbivore.parameters)
+        yield
+        Herbivore.set_given_parameters(default)
+
+    def test_table_matches_formula(self):
+        params = Herbivore.snapshot
+        for age in [0, 5, 40, 199, 250]:
+            q1 = 1 / (1 + np.exp(params['phi_age'] * (age - params['a_half'])))
+            q2 = 1 / (1 + np.exp(-params['phi_weight']
+                                 * (20 - params['w_half'])))
+            assert Herbivore._fitness_formula(age, 20, params) == \
+                pytest.approx(q1 * q2)
+
+    def test_rebuilt_on_parameter_change(self):
+        herb = Herbivore(age=10, weight=20.0)
+        fitness = herb.fitness
+        Herbivore.set_given_parameters({'a_half': 5})
+        assert Herbivore.snapshot.age_table[5] == pytest.approx(0.5)
+        herb.calculate_fitness()
+        assert herb.fitness < fitness
+
+    def test_batch_uses_table(self):
+        ages = np.arange(0, 60)
+        weights = np.full(60, 15.0)
+        from_table = Herbivore.batch_fitness(ages, weights,
+                                             Herbivore.snapshot)
+        from_formula = Herbivore.batch_fitness(ages, weights,
+                                               Herbivore.parameters)
+        assert from_table == pytest.approx(from_formula)
+
+
+class TestOwnSnapshot:
+    """
+    Tests for animals with their own parameter snapshot.
+    """
+    def test_own_snapshot(self):
+        snapshot = Herbivore.compile_parameters(
+            Herbivore.updated_parameters({'beta': 0.5}))
+        herb = Herbivore(age=3, weight=20.0, snapshot=snapshot)
+        herb.eat(10)
+        assert herb.weight == pytest.approx(25.0)
+        assert Herbivore.parameters['beta'] != 0.5
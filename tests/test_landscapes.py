@@ -11,7 +11,8 @@ __email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
 import math
 
 import pytest
-from biosim.landscapes import Desert, Ocean, Mountain, Savannah, Jungle
+from biosim.landscapes import (Landscape, Desert, Ocean, Mountain, Savannah,
+                               Jungle)
 from biosim.fauna import Herbivore, Carnivore
 import numpy as np
 
@@ -378,3 +379,162 @@ class TestJungle(TestLandscapes):
         jun.set_given_parameters({'f_max': 400})
         f_max_post_change = jun.parameters['f_max']
         assert f_max_post_change != f_max_pre_change
+
+
+class TestFodderState:
+    """
+    Fodder and herbivore weight are kept as state of the cell.
+    """
+
+    def test_savannah_regrowth_persists(self):
+        sav = Savannah()
+        f_max = sav.parameters['f_max']
+        for _ in range(3):
+            sav.add_animal(Herbivore(age=5, weight=20.0))
+        sav.feed_animals()
+        fodder_left = sav.fodder
+        assert fodder_left == f_max - 3 * Herbivore.parameters['F']
+        sav.feed_animals()
+        expected = fodder_left + sav.parameters['alpha'] * (
+            f_max - fodder_left) - 3 * Herbivore.parameters['F']
+        assert sav.fodder == pytest.approx(expected)
+
+    def test_herb_weight_tracking(self):
+        jun = Jungle()
+        herbs = [Herbivore(age=3, weight=w) for w in (5.0, 15.0, 30.0)]
+        for herb in herbs:
+            jun.add_animal(herb)
+        jun.add_animal(Carnivore(age=3, weight=10.0))
+        assert jun.total_herb_weight == pytest.approx(50.0)
+        jun.remove_animal(herbs[0])
+        assert jun.total_herb_weight == pytest.approx(45.0)
+        jun._grow_herb_fodder()
+        jun._feed_herbivore()
+        jun.lose_weight_animals()
+        assert jun.total_herb_weight == pytest.approx(
+            sum(h.weight for h in jun.in_cell_fauna['Herbivore']))
+        assert jun.available_fodder['Carnivore'] == jun.total_herb_weight
+
+
+class TestRemoval:
+    """
+    Removed animals are compacted once per stage without skipping any
+    animal.
+    """
+
+    def test_die_animals_visits_all(self, mocker):
+        """
+        With a death probability of one, every animal of the cell dies. With
+        in-place list removal every second animal used to be skipped.
+        """
+        jun = Jungle()
+        for _ in range(10):
+            jun.add_animal(Herbivore(age=5, weight=20.0))
+            jun.add_animal(Carnivore(age=5, weight=20.0))
+        mocker.patch('numpy.random.random', return_value=0.0)
+        jun.die_animals()
+        assert jun.num_animals('Herbivore') == 0
+        assert len(jun.in_cell_fauna['Herbivore']) == 0
+        assert jun.total_herb_weight == pytest.approx(0)
+
+    def test_mark_and_compact(self):
+        des = Desert()
+        herbs = [Herbivore(age=1, weight=10.0) for _ in range(4)]
+        for herb in herbs:
+            des.add_animal(herb)
+        des._mark_removed(herbs[1])
+        des._mark_removed(herbs[3])
+        assert des.num_animals('Herbivore') == 2
+        assert len(des.in_cell_fauna['Herbivore']) == 4
+        des._compact_fauna()
+        assert des.in_cell_fauna['Herbivore'] == [herbs[0], herbs[2]]
+        assert des.total_herb_weight == pytest.approx(20.0)
+
+
+class TestFeedingKernel:
+    """
+    The herbivore feeding kernel gives the same portions as feeding the
+    herbivores one by one.
+    """
+
+    @staticmethod
+    def sequential_portions(fodder, num_herbivores, appetite):
+        portions = []
+        for _ in range(num_herbivores):
+            if fodder >= appetite:
+                portions.append(appetite)
+                fodder -= appetite
+            elif fodder > 0:
+                portions.append(fodder)
+                fodder = 0
+            else:
+                portions.append(0)
+        return portions, fodder
+
+    @pytest.mark.parametrize("fodder, num_herbivores",
+                             [(300.0, 5), (25.0, 4), (0.0, 3), (7.5, 1)])
+    def test_same_as_sequential(self, fodder, num_herbivores):
+        appetite = 10.0
+        expected, expected_left = self.sequential_portions(
+            fodder, num_herbivores, appetite)
+        portions = Landscape.herbivore_portions(
+            fodder, np.arange(num_herbivores), appetite)
+        assert list(portions) == pytest.approx(expected)
+        assert Landscape.fodder_left(fodder, num_herbivores, appetite) == \
+            pytest.approx(expected_left)
+
+    def test_fittest_eats_first(self):
+        jun = Jungle()
+        jun.fodder = 15.0
+        strong = Herbivore(age=5, weight=40.0)
+        weak = Herbivore(age=5, weight=5.0)
+        jun.add_animal(weak)
+        jun.add_animal(strong)
+        strong_weight, weak_weight = strong.weight, weak.weight
+        jun._feed_herbivore()
+        beta = Herbivore.parameters['beta']
+        assert strong.weight == pytest.approx(
+            strong_weight + beta * Herbivore.parameters['F'])
+        assert weak.weight == pytest.approx(
+            weak_weight + beta * (15.0 - Herbivore.parameters['F']))
+        assert jun.fodder == 0
+
+
+class TestPredationKernel:
+    """
+    The predation kernel kills and eats following the hunting rules.
+    """
+
+    def test_stops_at_appetite(self):
+        rng = np.random.default_rng(1)
+        eaten, killed = Landscape.predation(
+            np.array([0.9, 0.8]), np.array([0.1, 0.2, 0.3]),
+            np.array([5.0, 30.0, 10.0]), 20.0, 1e-6, rng)
+        assert list(eaten) == [20.0, 10.0]
+        assert list(killed) == [True, True, True]
+
+    def test_weaker_carnivore_kills_nothing(self):
+        rng = np.random.default_rng(1)
+        eaten, killed = Landscape.predation(
+            np.array([0.2]), np.array([0.3, 0.5]), np.array([5.0, 30.0]),
+            50.0, 10.0, rng)
+        assert eaten[0] == 0
+        assert not killed.any()
+
+    def test_feed_carnivore_object_path(self):
+        jun = Jungle(rng=np.random.default_rng(2))
+        carn = Carnivore(age=5, weight=60.0)
+        herbs = [Herbivore(age=80, weight=2.0) for _ in range(5)]
+        for herb in herbs:
+            jun.add_animal(herb)
+        jun.add_animal(carn)
+        delta_phi_max = Carnivore.parameters['DeltaPhiMax']
+        Carnivore.set_given_parameters({'DeltaPhiMax': 1e-6})
+        try:
+            jun._feed_carnivore()
+        finally:
+            Carnivore.set_given_parameters({'DeltaPhiMax': delta_phi_max})
+        assert jun.num_animals('Herbivore') == 0
+        assert jun.total_herb_weight == pytest.approx(0)
+        assert carn.weight == pytest.approx(
+            60.0 + Carnivore.parameters['beta'] * 10.0)
@@ -10,6 +10,7 @@ __email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
 
 from random import seed
 
+import numpy as np
 import pytest
 
 from biosim.landscapes import Desert, Ocean, Mountain, Savannah, Jungle
@@ -133,6 +134,20 @@ class TestMap:
         assert m.total_num_animals_per_species('Herbivore') == 2
         assert m.total_num_animals_per_species('Carnivore') == 2
 
+    @pytest.mark.parametrize('loc', [(0, 5), (3, 0), (-1, 1)])
+    def test_add_animals_outside(self, loc):
+        """
+        Animals placed outside the island are rejected and not moved to
+        another cell.
+
+        """
+        m = Map("OOOO\nOJJO\nOOOO")
+        with pytest.raises(IndexError):
+            m.add_animals([{'loc': loc,
+                            'pop': [{'species': 'Herbivore', 'age': 1,
+                                     'weight': 10.0}]}])
+        assert m.total_num_animals_per_species('Herbivore') == 0
+
     def test_die_stage(self, gen_map_data):
         """
         number of animals should decrease after die
@@ -164,3 +179,378 @@ class TestMap:
         num_animals_after = m.total_num_animals_per_species('Herbivore')
         assert num_animals_after >= num_animals_before
 
+
+    def test_life_cycle_on_store(self, gen_map_data):
+        """
+        The life cycle runs on the population store, animals stay in
+        accessible cells and the object view matches the counts.
+
+        Parameters
+        ----------
+        gen_map_data: Map object
+
+        """
+        m = gen_map_data
+        m.add_animals([{"loc": (1, 14),
+                        "pop": [{"species": "Herbivore", "age": 5,
+                                 "weight": 20.0} for _ in range(50)] +
+                               [{"species": "Carnivore", "age": 5,
+                                 "weight": 20.0} for _ in range(5)]}])
+        for _ in range(5):
+            m.life_cycle()
+        for species in ('Herbivore', 'Carnivore'):
+            counts = m.num_animals_per_cell(species)
+            assert counts.sum() == m.total_num_animals_per_species(species)
+            assert counts[0, :].sum() == 0
+            assert counts[1, 1] == 0
+            assert len(m.cell_fauna((1, 14))[species]) == counts[1, 14]
+
+    def test_reproducible_with_generator(self):
+        """
+        Two maps driven by generators with the same seed give the same
+        population, independently of the global random state.
+
+        """
+        map_str = """OOOOO
+                     OJJSO
+                     OOOOO"""
+        pop = [{"loc": (1, 1),
+                "pop": [{"species": "Herbivore", "age": 5, "weight": 20.0}
+                        for _ in range(20)]}]
+        results = []
+        for global_seed in (1, 2):
+            np.random.seed(global_seed)
+            m = Map(map_str, rng=np.random.default_rng(42))
+            m.add_animals(pop)
+            for _ in range(5):
+                m.life_cycle()
+            herbivores = m.population['Herbivore']
+            herbivores.sort_by_cell(by_fitness=True)
+            results.append(herbivores.weight.copy())
+        assert np.array_equal(results[0], results[1])
+
+    def test_fodder_array(self, gen_map_data):
+        """
+        Fodder is kept as an island wide array and reduced by feeding.
+
+        Parameters
+        ----------
+        gen_map_data: Map object
+
+        """
+        m = gen_map_data
+        assert m.fodder.shape == m.cells_dims
+        assert m.fodder[0, 0] == 0
+        assert m.fodder[1, 14] == Jungle.parameters['f_max']
+        m.add_animals([{"loc": (1, 14),
+                        "pop": [{"species": "Herbivore", "age": 5,
+                                 "weight": 20.0} for _ in range(3)]}])
+        m._feed_stage()
+        assert m.fodder[1, 14] == \
+            Jungle.parameters['f_max'] - 3 * Herbivore.parameters['F']
+        assert m.fodder[1, 2] == Savannah.parameters['f_max']
+
+    def test_active_cells(self, gen_map_data):
+        """
+        Only accessible cells holding animals are active, and the index
+        follows births, deaths and migration.
+
+        Parameters
+        ----------
+        gen_map_data: Map object
+
+        """
+        m = gen_map_data
+        assert len(m.active_cells) == 0
+        m.add_animals([{"loc": (1, 14),
+                        "pop": [{"species": "Herbivore", "age": 5,
+                                 "weight": 20.0} for _ in range(30)]},
+                       {"loc": (1, 1),
+                        "pop": [{"species": "Herbivore", "age": 5,
+                                 "weight": 20.0}]}])
+        assert list(m.active_cells) == [m._cell_index((1, 14))]
+        for _ in range(4):
+            m.life_cycle()
+        counts = m.num_animals_per_cell('Herbivore') + \
+            m.num_animals_per_cell('Carnivore')
+        occupied = np.flatnonzero(counts.ravel() > 0)
+        accessible = [c for c in occupied if m.cells.flat[c].is_accessible]
+        assert list(m.active_cells) == accessible
+
+    def test_neighbour_table(self, gen_map_data):
+        """
+        The neighbour table holds the 4 adjacent cells of every cell and
+        marks only accessible neighbours.
+
+        Parameters
+        ----------
+        gen_map_data: Map object
+
+        """
+        m = gen_map_data
+        rows, cols = m.cells_dims
+        assert m._neighbours.shape == (rows * cols, 4)
+        cell = m._cell_index((1, 2))
+        assert list(m._neighbours[cell]) == [2, 2 * cols + 2,
+                                             cols + 1, cols + 3]
+        assert list(m._neighbour_accessible[cell]) == [False, False,
+                                                       False, False]
+        assert list(m._neighbours[0]) == [-1, cols, -1, 1]
+        cell = m._cell_index((1, 14))
+        assert list(m._neighbour_accessible[cell]) == [False, False,
+                                                       True, True]
+        assert isinstance(m._adj_cells(1, 14)[2], Jungle)
+
+    def test_propensity_field(self, gen_map_data):
+        """
+        The propensity field matches the propensity of the landscape cells
+        and is zero for ocean and mountain.
+
+        Parameters
+        ----------
+        gen_map_data: Map object
+
+        """
+        m = gen_map_data
+        m.add_animals([{"loc": (1, 14),
+                        "pop": [{"species": "Herbivore", "age": 5,
+                                 "weight": 20.0} for _ in range(3)]}])
+        field = m.propensity_field('Herbivore')
+        assert field.shape == m.cells_dims
+        assert field[0, 0] == 0
+        assert field[1, 10] == 0
+        params = Herbivore.parameters
+        f_max = Jungle.parameters['f_max']
+        assert field[1, 14] == pytest.approx(
+            np.exp(params['lambda'] * f_max / (4 * params['F'])))
+        assert field[1, 15] == pytest.approx(
+            np.exp(params['lambda'] * f_max / params['F']))
+
+    def test_migration_keeps_animals_on_land(self):
+        """
+        Migration moves animals only to accessible neighbours and never
+        loses animals.
+
+        """
+        m = Map("""OOOOO
+                   OJJJO
+                   OJMJO
+                   OOOOO""", rng=np.random.default_rng(3))
+        m.add_animals([{"loc": (1, 2),
+                        "pop": [{"species": "Herbivore", "age": 5,
+                                 "weight": 40.0} for _ in range(200)]}])
+        m.set_animal_parameters('Herbivore', {'mu': 1.0})
+        m._migrate_stage()
+        counts = m.num_animals_per_cell('Herbivore')
+        assert counts.sum() == 200
+        assert counts[1, 2] < 200
+        assert counts[2, 2] == 0
+        assert counts[1, 1] + counts[1, 3] + counts[1, 2] == 200
+
+    def test_migration_large_propensity(self):
+        """
+        Neighbours with propensities too large for floating point, here
+        e ^ 900, are still chosen with equal probability.
+
+        """
+        m = Map("""OOOOO
+                   OJJJO
+                   OJJJO
+                   OJJJO
+                   OOOOO""", rng=np.random.default_rng(4))
+        m.set_animal_parameters('Herbivore', {'mu': 1.0, 'lambda': 30.0})
+        m.add_animals([{"loc": (2, 2),
+                        "pop": [{"species": "Herbivore", "age": 5,
+                                 "weight": 40.0} for _ in range(1000)]}])
+        m._migrate_stage()
+        counts = m.num_animals_per_cell('Herbivore')
+        moved = 1000 - counts[2, 2]
+        assert moved > 500
+        for loc in [(1, 2), (3, 2), (2, 1), (2, 3)]:
+            assert counts[loc] == pytest.approx(moved / 4, rel=0.25)
+
+    def test_migration_large_carnivore_propensity(self):
+        """
+        Carnivores next to cells with very many herbivores split between
+        those cells and do not go to the poorer neighbours.
+
+        """
+        m = Map("""OOOOO
+                   OJJJO
+                   OJJJO
+                   OJJJO
+                   OOOOO""", rng=np.random.default_rng(5))
+        m.set_animal_parameters('Herbivore', {'mu': 0.0})
+        m.set_animal_parameters('Carnivore', {'mu': 1.0})
+        m.add_animals([{"loc": loc,
+                        "pop": [{"species": "Herbivore", "age": 5,
+                                 "weight": 100.0} for _ in range(500)]}
+                       for loc in [(1, 2), (2, 1)]])
+        m.add_animals([{"loc": (2, 2),
+                        "pop": [{"species": "Carnivore", "age": 5,
+                                 "weight": 40.0} for _ in range(2000)]}])
+        m._migrate_stage()
+        counts = m.num_animals_per_cell('Carnivore')
+        moved = 2000 - counts[2, 2]
+        assert moved > 1000
+        assert counts[3, 2] == counts[2, 3] == 0
+        assert counts[1, 2] == pytest.approx(moved / 2, rel=0.1)
+        assert counts[2, 1] == pytest.approx(moved / 2, rel=0.1)
+
+    def test_fused_end_of_year(self):
+        """
+        The fused end of year pass gives the same animals as aging, losing
+        weight and then dying in separate steps.
+
+        """
+        m = Map("""OOOO
+                   OJJO
+                   OOOO""", rng=np.random.default_rng(7))
+        m.add_animals([{"loc": (1, 1),
+                        "pop": [{"species": "Herbivore", "age": a,
+                                 "weight": 3.0 + a} for a in range(40)]}])
+        herbivores = m.population['Herbivore']
+        params = Herbivore.parameters
+        ages = herbivores.age + 1
+        weights = herbivores.weight * (1 - params['eta'])
+        fitness = Herbivore.batch_fitness(ages, weights, params)
+        dies = Herbivore.die_batch(fitness, Herbivore.snapshot,
+                                   np.random.default_rng(7))
+        m._age_lose_weight_die_stage()
+        assert list(herbivores.age) == list(ages[~dies])
+        assert list(herbivores.weight) == pytest.approx(list(weights[~dies]))
+        assert list(herbivores.fitness) == pytest.approx(
+            list(fitness[~dies]))
+
+    def test_parameters_isolated(self):
+        """
+        Parameters set on one map neither change other maps nor the species
+        and landscape classes.
+
+        """
+        island = """OOOO
+                    OJSO
+                    OOOO"""
+        m_1 = Map(island)
+        m_2 = Map(island)
+        beta = Herbivore.parameters['beta']
+        f_max = Savannah.parameters['f_max']
+        m_1.set_animal_parameters('Herbivore', {'beta': 0.1})
+        m_1.set_landscape_parameters('S', {'f_max': 10.0})
+        assert m_1.population['Herbivore'].parameters['beta'] == 0.1
+        assert m_2.population['Herbivore'].parameters['beta'] == beta
+        assert Herbivore.parameters['beta'] == beta
+        assert Savannah.parameters['f_max'] == f_max
+        m_1._grow_fodder()
+        m_2._grow_fodder()
+        assert m_1.fodder[1, 2] < m_2.fodder[1, 2]
+        assert m_1.cell_fauna((1, 1))['Herbivore'] == []
+
+    def test_parameters_with_threads(self):
+        """
+        Differently parameterised maps give the same results when they run
+        side by side in a thread pool as when they run one after the other.
+
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        def run(omega):
+            m = Map("""OOOOO
+                       OJJSO
+                       OOOOO""", rng=np.random.default_rng(11))
+            m.set_animal_parameters('Herbivore', {'omega': omega})
+            m.add_animals([{"loc": (1, 1),
+                            "pop": [{"species": "Herbivore", "age": 5,
+                                     "weight": 20.0} for _ in range(50)]}])
+            for _ in range(20):
+                m.life_cycle()
+            return m.num_animals_per_cell('Herbivore')
+
+        omegas = [0.1, 0.9, 0.4, 0.6]
+        sequential = [run(omega) for omega in omegas]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            threaded = list(executor.map(run, omegas))
+        for counts_1, counts_2 in zip(sequential, threaded):
+            assert np.array_equal(counts_1, counts_2)
+        assert not np.array_equal(sequential[0], sequential[1])
+
+    def test_cell_fauna_keeps_trajectory(self):
+        """
+        Inspecting the animals of a cell does not draw numbers from the
+        random number generator of the map.
+
+        """
+        island = "OOOO\nOJJO\nOOOO"
+        pop = [{'loc': (1, 1),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20.0}
+                        for _ in range(10)]
+                + [{'species': 'Carnivore', 'age': 5, 'weight': 20.0}
+                   for _ in range(3)]}]
+        maps = []
+        for inspect in (False, True):
+            m = Map(island, rng=np.random.default_rng(8))
+            m.add_animals(pop)
+            if inspect:
+                fauna = m.cell_fauna((1, 1))
+                for animal in fauna['Herbivore'] + fauna['Carnivore']:
+                    animal.move_prob
+                    animal.birth_prob(13)
+                    animal.death_prob
+                fauna['Carnivore'][0].kill_prob(fauna['Herbivore'][0])
+            for _ in range(5):
+                m.life_cycle()
+            maps.append(m)
+        for species in ('Herbivore', 'Carnivore'):
+            assert np.array_equal(maps[0].population[species].weight,
+                                  maps[1].population[species].weight)
+
+    def test_least_fit_herbivores_give_birth(self):
+        """
+        As in Landscape.give_birth_animals, only the least fit half of the
+        herbivores of a cell may give birth after the feed stage.
+
+        """
+        m = Map("OOO\nOJO\nOOO", rng=np.random.default_rng(3))
+        m.set_animal_parameters('Herbivore', {'gamma': 100.0, 'zeta': 0.0})
+        m.add_animals([{'loc': (1, 1),
+                        'pop': [{'species': 'Herbivore', 'age': 5,
+                                 'weight': weight}
+                                for weight in (40.0, 20.0, 50.0, 30.0)]}])
+        herbivores = m.population['Herbivore']
+        # the order the feed stage leaves the herbivores in
+        herbivores.sort_by_cell(by_fitness=True)
+        m._give_birth_stage()
+        adults = herbivores.age > 0
+        weights = dict(zip([50.0, 40.0, 30.0, 20.0],
+                           herbivores.weight[adults]))
+        assert m.total_num_animals_per_species('Herbivore') == 6
+        assert weights[50.0] == 50.0 and weights[40.0] == 40.0
+        assert weights[30.0] < 30.0 and weights[20.0] < 20.0
+
+    def test_incremental_counts(self):
+        """
+        The count matrices kept by the map agree with a full count of the
+        animals after every year.
+
+        """
+        m = Map("""OOOOOO
+                   OJJSDO
+                   OJMJJO
+                   OOOOOO""", rng=np.random.default_rng(5))
+        m.add_animals([{"loc": (1, 1),
+                        "pop": [{"species": "Herbivore", "age": 5,
+                                 "weight": 30.0} for _ in range(60)]
+                        + [{"species": "Carnivore", "age": 5,
+                            "weight": 30.0} for _ in range(10)]}])
+        for _ in range(10):
+            m.life_cycle()
+            for species in ('Herbivore', 'Carnivore'):
+                counts = m.num_animals_per_cell(species)
+                expected = np.bincount(
+                    m.population[species].cell,
+                    minlength=counts.size).reshape(counts.shape)
+                assert np.array_equal(counts, expected)
+                assert counts.sum() == \
+                    m.total_num_animals_per_species(species)
+        with pytest.raises(ValueError):
+            m.num_animals_per_cell('Herbivore')[1, 1] = 0
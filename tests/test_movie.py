@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test set for streaming frames into ffmpeg. The fake_ffmpeg fixture stands
+in for ffmpeg, so the tests do not need ffmpeg.
+
+"""
+
+__author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
+__email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
+
+import os
+
+import pytest
+import matplotlib.pyplot as plt
+
+from biosim.movie import MovieWriter
+from biosim.simulation import BioSim
+
+
+class TestMovieWriter:
+    """
+    This set of tests checks that the frames reach ffmpeg unchanged and
+    that failures are reported.
+    """
+    def test_command(self):
+        writer = MovieWriter('sim.mp4')
+        command = writer.command(640, 480)
+        assert command[0] == 'ffmpeg'
+        assert command[command.index('-s') + 1] == '640x480'
+        assert command[command.index('-i') + 1] == '-'
+        assert command[-1] == 'sim.mp4'
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            MovieWriter('sim.avi', 'avi')
+
+    def test_frames_streamed(self, tmpdir, fake_ffmpeg):
+        filename = str(tmpdir.join('sim.mp4'))
+        fig = plt.figure(figsize=(2, 1), dpi=50)
+        writer = MovieWriter(filename, binary=fake_ffmpeg)
+        for _ in range(3):
+            writer.write_frame(fig)
+        writer.close()
+        plt.close(fig)
+        assert writer.frame_size == (100, 50)
+        assert writer.num_frames == 3
+        assert os.path.getsize(filename) == 3 * 100 * 50 * 4
+
+    def test_missing_ffmpeg(self, tmpdir):
+        fig = plt.figure(figsize=(2, 1), dpi=50)
+        writer = MovieWriter(str(tmpdir.join('sim.mp4')),
+                             binary=str(tmpdir.join('no_ffmpeg')))
+        with pytest.raises(RuntimeError):
+            writer.write_frame(fig)
+        plt.close(fig)
+
+    def test_frame_size_changed(self, tmpdir, fake_ffmpeg):
+        fig = plt.figure(figsize=(2, 1), dpi=50)
+        writer = MovieWriter(str(tmpdir.join('sim.mp4')), binary=fake_ffmpeg)
+        writer.write_frame(fig)
+        fig.set_size_inches(3, 1)
+        with pytest.raises(ValueError):
+            writer.write_frame(fig)
+        writer.close()
+        plt.close(fig)
+
+    def test_simulation_streams_without_images(self, tmpdir, fake_ffmpeg,
+                                               mocker):
+        mocker.patch('biosim.simulation._FFMPEG_BINARY', fake_ffmpeg)
+        mocker.patch('matplotlib.pyplot.pause')
+        img_base = str(tmpdir.join('sim'))
+        sim = BioSim("OOO\nOJO\nOOO", [], seed=1, img_base=img_base,
+                     img_fmt=None, movie_fmt='mp4')
+        sim.simulate(4, vis_years=1, img_years=2)
+        sim.make_movie('mp4')
+        width, height = sim._fig.canvas.get_width_height()
+        plt.close('all')
+        assert sorted(os.listdir(str(tmpdir))) == ['ffmpeg', 'sim.mp4']
+        assert os.path.getsize(img_base + '.mp4') == 2 * width * height * 4
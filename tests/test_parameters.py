@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test set for the compiled parameter snapshots.
+
+"""
+
+__author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
+__email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
+
+import pytest
+import numpy as np
+
+from biosim.fauna import Herbivore, Carnivore
+from biosim.landscapes import Savannah
+from biosim.parameters import ParameterSnapshot
+
+
+class TestParameterSnapshot:
+    """
+    This set of tests checks that the snapshots hold the parameters and
+    their derived constants, can't be changed and follow
+    set_given_parameters.
+    """
+    @pytest.fixture
+    def restore_parameters(self):
+        """
+        Restores the class parameters changed by a test.
+
+        """
+        herb_default = dict(Herbivore.parameters)
+        sav_default = dict(Savannah.parameters)
+        yield
+        Herbivore.set_given_parameters(herb_default)
+        Savannah.set_given_parameters(sav_default)
+
+    def test_attributes_and_keys(self):
+        snapshot = ParameterSnapshot({'F': 10.0, 'lambda': 1.0},
+                                     derived=2.0)
+        assert snapshot.F == snapshot['F'] == 10.0
+        assert snapshot.lambda_ == snapshot['lambda'] == 1.0
+        assert snapshot.derived == 2.0
+        assert 'lambda' in snapshot
+        assert snapshot.as_dict() == {'F': 10.0, 'lambda': 1.0}
+        with pytest.raises(KeyError):
+            snapshot['mu']
+
+    def test_immutable(self):
+        snapshot = ParameterSnapshot({'F': 10.0}, table=np.arange(3.0))
+        with pytest.raises(AttributeError):
+            snapshot.F = 20.0
+        with pytest.raises(AttributeError):
+            del snapshot.F
+        with pytest.raises(ValueError):
+            snapshot.table[0] = 1.0
+
+    def test_derived_constants(self):
+        snapshot = Carnivore.snapshot
+        params = Carnivore.parameters
+        assert snapshot.birth_threshold == pytest.approx(
+            params['zeta'] * (params['w_birth'] + params['sigma_birth']))
+        assert snapshot.age_terms[10] == pytest.approx(
+            1 / (1 + np.exp(params['phi_age'] * (10 - params['a_half']))))
+
+    def test_follows_set_given_parameters(self, restore_parameters):
+        Herbivore.set_given_parameters({'zeta': 1.0, 'F': 20.0})
+        assert Herbivore.snapshot.F == 20.0
+        assert Herbivore.snapshot.birth_threshold == pytest.approx(
+            Herbivore.parameters['w_birth']
+            + Herbivore.parameters['sigma_birth'])
+        Savannah.set_given_parameters({'f_max': 100.0})
+        assert Savannah.snapshot.f_max == 100.0
+        assert Savannah().fodder == 100.0
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test set for the columnar population store.
+
+"""
+
+__author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
+__email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
+
+import pytest
+import numpy as np
+
+from biosim.fauna import Herbivore, Carnivore
+from biosim.population import Population, SpeciesPopulation
+
+
+class TestPopulation:
+    """
+    This set of tests checks the population store keeps the animals rows
+    consistent.
+    """
+    @pytest.fixture
+    def gen_population_data(self):
+        """
+        Population of a 3 cells island with three herbivores and one
+        carnivore.
+
+        Returns
+        -------
+        population: Population object
+        """
+        population = Population(3)
+        population['Herbivore'].append([1, 2, 3], [10.0, 20.0, 30.0],
+                                       [2, 0, 2])
+        population['Carnivore'].append([4], [15.0], [1])
+        return population
+
+    def test_append(self, gen_population_data):
+        """
+        Appended animals get a fitness equal to the scalar fitness of Fauna
+        objects.
+        """
+        herbivores = gen_population_data['Herbivore']
+        assert len(herbivores) == 3
+        assert gen_population_data.num_animals('Carnivore') == 1
+        herb = Herbivore(age=2, weight=20.0)
+        assert herbivores.fitness[1] == pytest.approx(herb.fitness)
+
+    def test_keep(self, gen_population_data):
+        """
+        Compaction keeps the rows of the surviving animals together.
+        """
+        herbivores = gen_population_data['Herbivore']
+        herbivores.keep(np.array([True, False, True]))
+        assert list(herbivores.age) == [1, 3]
+        assert list(herbivores.weight) == [10.0, 30.0]
+        assert list(herbivores.cell) == [2, 2]
+
+    def test_sort_by_cell(self, gen_population_data):
+        """
+        After sorting, the animals of a cell are a contiguous slice.
+        """
+        herbivores = gen_population_data['Herbivore']
+        herbivores.sort_by_cell(by_fitness=True)
+        bounds = herbivores.cell_bounds(3)
+        assert list(bounds) == [0, 1, 1, 3]
+        assert list(herbivores.cell) == [0, 2, 2]
+        assert herbivores.fitness[1] >= herbivores.fitness[2]
+
+    def test_count_per_cell(self, gen_population_data):
+        assert list(gen_population_data.count_per_cell('Herbivore')) == \
+               [1, 0, 2]
+        assert list(gen_population_data.count_per_cell('Carnivore')) == \
+               [0, 1, 0]
+
+    def test_fauna_in_cell(self, gen_population_data):
+        """
+        The object view returns Fauna objects with the stored values.
+        """
+        in_cell_fauna = gen_population_data.fauna_in_cell(1)
+        assert len(in_cell_fauna['Herbivore']) == 0
+        carn = in_cell_fauna['Carnivore'][0]
+        assert isinstance(carn, Carnivore)
+        assert carn.age == 4
+        assert carn.weight == 15.0
+
+    def test_empty_species(self):
+        """
+        An empty population has no animals in any cell.
+        """
+        population = SpeciesPopulation(Herbivore)
+        assert len(population) == 0
+        assert list(population.count_per_cell(2)) == [0, 0]
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test set for rendering the simulation graphics in a background process.
+
+"""
+
+__author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
+__email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
+
+import os
+
+import pytest
+import numpy as np
+import matplotlib.pyplot as plt
+
+from biosim.render import RenderWorker
+from biosim.simulation import BioSim
+
+
+class TestRenderWorker:
+    """
+    This set of tests checks that frames rendered in the background are
+    the same as frames rendered by the simulation itself, and that errors
+    of the rendering process reach the simulation.
+    """
+    @pytest.fixture
+    def gen_render_data(self):
+        """
+        Small island with both species.
+
+        Returns
+        -------
+        island_map: str
+        ini_pop: list
+        """
+        island_map = "OOOOO\nOJJSO\nOOOOO"
+        ini_pop = [{'loc': (1, 1),
+                    'pop': [{'species': 'Herbivore', 'age': 5,
+                             'weight': 20.0} for _ in range(20)]
+                    + [{'species': 'Carnivore', 'age': 5,
+                        'weight': 20.0} for _ in range(5)]}]
+        return island_map, ini_pop
+
+    def test_same_images(self, tmpdir, gen_render_data, mocker):
+        mocker.patch('matplotlib.pyplot.show')
+        island_map, ini_pop = gen_render_data
+        images = {}
+        for background in (False, True):
+            img_base = str(tmpdir.join('bg' if background else 'fg'))
+            sim = BioSim(island_map, ini_pop, seed=4, img_base=img_base,
+                         background_rendering=background)
+            # consecutive years, so the population curves have segments
+            sim.simulate(4, img_years=1)
+            plt.close('all')
+            assert (sim._fig is None) == background
+            images[background] = [plt.imread('{}_{:05d}.png'.format(
+                img_base, num)) for num in range(4)]
+        for foreground, background in zip(images[False], images[True]):
+            assert np.array_equal(foreground, background)
+
+    def test_movie(self, tmpdir, gen_render_data, fake_ffmpeg, mocker):
+        mocker.patch('biosim.simulation._FFMPEG_BINARY', fake_ffmpeg)
+        island_map, ini_pop = gen_render_data
+        img_base = str(tmpdir.join('sim'))
+        sim = BioSim(island_map, ini_pop, seed=4, img_base=img_base,
+                     img_fmt=None, movie_fmt='mp4',
+                     background_rendering=True)
+        sim.simulate(4, img_years=1)
+        sim.simulate(2, img_years=1)
+        sim.make_movie('mp4')
+        width, height = plt.rcParams['figure.figsize']
+        dpi = plt.rcParams['figure.dpi']
+        frame_bytes = int(width * dpi) * int(height * dpi) * 4
+        assert os.path.getsize(img_base + '.mp4') == 6 * frame_bytes
+
+    def test_error_reported(self, tmpdir):
+        worker = RenderWorker("OOO\nOJO\nOOO", (3, 3), 100)
+        worker.setup(10)
+        counts = {'Herbivore': 1, 'Carnivore': 0}
+        distributions = {'Herbivore': np.zeros((3, 3), dtype=int),
+                         'Carnivore': np.zeros((3, 3), dtype=int)}
+        worker.render(0, counts, distributions,
+                      str(tmpdir.join('missing', 'sim_00000.png')))
+        with pytest.raises(RuntimeError):
+            worker.flush()
+
+    def test_bounded_queue(self, tmpdir):
+        with pytest.raises(ValueError):
+            RenderWorker("OOO\nOJO\nOOO", (3, 3), 100, queue_size=0)
+        worker = RenderWorker("OOO\nOJO\nOOO", (3, 3), 100, queue_size=2)
+        worker.setup(20)
+        distributions = {'Herbivore': np.zeros((3, 3), dtype=int),
+                         'Carnivore': np.zeros((3, 3), dtype=int)}
+        for year in range(20):
+            distributions['Herbivore'][1, 1] = year
+            worker.render(year, {'Herbivore': year, 'Carnivore': 0},
+                          distributions,
+                          str(tmpdir.join('sim_{:05d}.png'.format(year))))
+        worker.close()
+        assert len(tmpdir.listdir()) == 20
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test set for BioSim class functionality beyond the EPAP interface.
+
+"""
+
+__author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
+__email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
+
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+import numpy as np
+import matplotlib.pyplot as plt
+
+from biosim.simulation import BioSim
+from biosim.visualisation import Visualisation
+
+
+class TestCheckpoint:
+    """
+    This set of tests checks that a simulation restored from a checkpoint
+    continues exactly as the original simulation.
+    """
+    @pytest.fixture
+    def gen_simulation_data(self, tmpdir):
+        """
+        Simulation of a small island with both species after 5 years.
+
+        Returns
+        -------
+        sim: BioSim
+        img_base: str
+        """
+        img_base = str(tmpdir.join('img'))
+        ini_pop = [{'loc': (1, 1),
+                    'pop': [{'species': 'Herbivore', 'age': 5,
+                             'weight': 20.0} for _ in range(40)]
+                    + [{'species': 'Carnivore', 'age': 5,
+                        'weight': 20.0} for _ in range(8)]}]
+        sim = BioSim("OOOOO\nOJJSO\nOJDJO\nOOOOO", ini_pop, seed=12,
+                     img_base=img_base)
+        sim.set_animal_parameters('Herbivore', {'omega': 0.3})
+        sim.set_landscape_parameters('J', {'f_max': 600.0})
+        sim.simulate(5, vis_years=100)
+        yield sim, img_base
+        plt.close('all')
+
+    def test_exact_continuation(self, gen_simulation_data, tmpdir):
+        sim, img_base = gen_simulation_data
+        path = str(tmpdir.join('checkpoint.npz'))
+        sim.save_checkpoint(path)
+        restored = BioSim.load_checkpoint(path, img_base=img_base)
+        assert restored.year == sim.year
+        assert restored.num_animals_per_species == sim.num_animals_per_species
+
+        sim.simulate(5, vis_years=100)
+        restored.simulate(5, vis_years=100)
+        assert restored.year == sim.year == 10
+        original = sim._map.state_arrays()
+        continued = restored._map.state_arrays()
+        for name, array in original.items():
+            assert np.array_equal(array, continued[name]), name
+
+    def test_suffix_and_history(self, gen_simulation_data, tmpdir):
+        sim, img_base = gen_simulation_data
+        path = str(tmpdir.join('checkpoint'))
+        sim.save_checkpoint(path)
+        assert tmpdir.join('checkpoint.npz').check()
+        restored = BioSim.load_checkpoint(path, img_base=img_base)
+        history = sim.population_history
+        restored_history = restored.population_history
+        for key in ('Year', 'Herbivore', 'Carnivore'):
+            assert restored_history[key].dtype == history[key].dtype
+            assert np.array_equal(restored_history[key], history[key])
+        assert list(restored_history['Year']) == [1, 2, 3, 4, 5]
+
+    def test_no_pickled_objects(self, gen_simulation_data, tmpdir):
+        sim, _ = gen_simulation_data
+        path = str(tmpdir.join('checkpoint.npz'))
+        sim.save_checkpoint(path)
+        with np.load(path, allow_pickle=False) as checkpoint:
+            assert all(checkpoint[name].dtype != object
+                       for name in checkpoint.files)
+            assert 'Herbivore_age' in checkpoint.files
+
+
+class TestHeadless:
+    """
+    This set of tests checks that a headless simulation never uses
+    matplotlib and only records data.
+    """
+    def test_no_graphics_no_output(self, mocker, capsys):
+        figure = mocker.patch('matplotlib.pyplot.figure')
+        pause = mocker.patch('matplotlib.pyplot.pause')
+        savefig = mocker.patch('matplotlib.pyplot.savefig')
+        ini_pop = [{'loc': (1, 1),
+                    'pop': [{'species': 'Herbivore', 'age': 5,
+                             'weight': 20.0} for _ in range(20)]}]
+        sim = BioSim("OOOO\nOJJO\nOOOO", ini_pop, seed=3)
+        sim.simulate(10, vis_years=None)
+        assert not figure.called
+        assert not pause.called
+        assert not savefig.called
+        assert capsys.readouterr().out == ''
+        history = sim.population_history
+        assert list(history['Year']) == list(range(1, 11))
+        assert history['Herbivore'][-1] == \
+            sim.num_animals_per_species['Herbivore']
+        assert list(history['Carnivore']) == [0] * 10
+
+
+class TestImports:
+    """
+    This set of tests checks that the simulation engine can be imported
+    without loading the plotting and data frame libraries, which take most
+    of the import time.
+    """
+    @pytest.mark.parametrize('module', ['biosim', 'biosim.fauna',
+                                        'biosim.landscapes', 'biosim.map',
+                                        'biosim.simulation',
+                                        'biosim.ensemble', 'biosim.sweep'])
+    def test_no_heavy_imports(self, module):
+        code = ('import sys, {}; print(" ".join(sorted({{'
+                'name.split(".")[0] for name in sys.modules}})))'
+                .format(module))
+        src_dir = os.path.join(os.path.dirname(__file__), '..', 'src')
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [src_dir, env.get('PYTHONPATH', '')])
+        loaded = subprocess.check_output([sys.executable, '-c', code],
+                                         env=env).decode().split()
+        assert 'matplotlib' not in loaded
+        assert 'pandas' not in loaded
+
+    def test_distribution_export(self):
+        sim = BioSim("OOO\nOJO\nOOO", [], seed=1)
+        assert 'Herbivore' in sim.animal_distribution.columns
+
+
+class TestGraphics:
+    """
+    This set of tests checks that the yearly updates of the figure only
+    blit the changing artists and still give the complete figure.
+    """
+    @pytest.fixture
+    def gen_graphics_data(self):
+        """
+        Simulation of a small island with both species and its figure
+        set up.
+
+        Returns
+        -------
+        sim: BioSim
+        """
+        ini_pop = [{'loc': (1, 1),
+                    'pop': [{'species': 'Herbivore', 'age': 5,
+                             'weight': 20.0} for _ in range(20)]
+                    + [{'species': 'Carnivore', 'age': 5,
+                        'weight': 20.0} for _ in range(5)]}]
+        sim = BioSim("OOOOO\nOJJSO\nOOOOO", ini_pop, seed=2, img_fmt=None)
+        sim._final_year = 10
+        sim._setup_graphics()
+        yield sim
+        plt.close(sim._fig)
+
+    def test_updates_blit(self, gen_graphics_data, mocker):
+        sim = gen_graphics_data
+        sim._update_graphics()
+        draw = mocker.spy(sim._fig.canvas, 'draw')
+        for _ in range(3):
+            sim._map.life_cycle()
+            sim._year += 1
+            sim._update_graphics()
+        assert not draw.called
+        for axes in sim._fig.axes[2:]:
+            assert len(axes.images) == 1
+
+    def test_blitted_frame_complete(self, gen_graphics_data):
+        sim = gen_graphics_data
+        for _ in range(3):
+            sim._update_graphics()
+            sim._map.life_cycle()
+            sim._year += 1
+        sim._update_graphics()
+        blitted = np.array(sim._fig.canvas.buffer_rgba())
+        buffer = io.BytesIO()
+        sim._fig.savefig(buffer, format='rgba')
+        saved = np.frombuffer(buffer.getvalue(), dtype=np.uint8)
+        # only antialiased spine edges, drawn twice when blitting, differ
+        difference = np.abs(blitted.ravel().astype(int) - saved)
+        assert difference.max() < 32
+        assert sim._vis._year_text.get_text() == 'Year: 3'
+
+    def test_fixed_color_limits(self):
+        ini_pop = [{'loc': (1, 1),
+                    'pop': [{'species': 'Herbivore', 'age': 5,
+                             'weight': 20.0} for _ in range(20)]}]
+        sim = BioSim("OOOOO\nOJJSO\nOOOOO", ini_pop, seed=2, img_fmt=None,
+                     cmax_animals={'Carnivore': 10})
+        sim._final_year = 10
+        sim._setup_graphics()
+        sim._update_graphics()
+        sim.add_population([{'loc': (1, 3),
+                             'pop': [{'species': 'Carnivore', 'age': 5,
+                                      'weight': 20.0} for _ in range(3)]},
+                            {'loc': (1, 2),
+                             'pop': [{'species': 'Carnivore', 'age': 5,
+                                      'weight': 20.0} for _ in range(6)]}])
+        sim._update_graphics()
+        image = sim._vis._carnivore_img_axis
+        plt.close(sim._fig)
+        assert image.get_clim() == (0, 10)
+        assert sim._vis._herbivore_img_axis.get_clim() == (0, 5)
+        colors = image.to_rgba(image.get_array())
+        assert not np.array_equal(colors[1, 2], colors[1, 3])
+        assert not np.array_equal(colors[1, 1], colors[1, 3])
+
+    def test_color_limits_follow_counts(self):
+        fig = plt.figure()
+        vis = Visualisation("OOO\nOJO\nOOO", fig, (3, 3))
+        vis.animal_dist_graphs()
+        distribution = np.zeros((3, 3), dtype=int)
+        vis.update_carnivore_dist(distribution)
+        distribution[1, 1] = 6
+        vis.update_carnivore_dist(distribution)
+        plt.close(fig)
+        assert vis._carnivore_img_axis.get_clim() == (0, 6)
@@ -79,8 +79,8 @@ class TestProbability:
         Then, use mock for numpy random number and set the return_value to
         it in the way taht it always fulfill death_prob = True for carn_1
         Finally, run the die_animal method for all of the animals of jungle
-        instance and assert that the 2 animals are died and only the other 2
-        are in the animal list.
+        instance and assert that all 4 animals died, since the random number
+        is always below the death probability and no animal is skipped.
 
         """
 
@@ -101,5 +101,5 @@ class TestProbability:
         h_count = len(j.in_cell_fauna['Herbivore'])
         c_count = len(j.in_cell_fauna['Carnivore'])
         fauna_count = h_count + c_count
-        assert fauna_count == 2
+        assert fauna_count == 0
 
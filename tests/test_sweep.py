@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test set for the parameter sweeps and their result cache.
+
+"""
+
+__author__ = 'Mohamed Radwan, Nasibeh Mohammadi'
+__email__ = 'mohamed.radwan@nmbu.no, nasibeh.mohammadi@nmbu.no'
+
+import pytest
+import numpy as np
+
+from biosim import ensemble, sweep
+
+
+class TestSweep:
+    """
+    This set of tests checks the parameter spaces, the cache keys and that
+    a repeated sweep only simulates new points.
+    """
+    @pytest.fixture
+    def gen_sweep_data(self):
+        """
+        Small island with herbivores.
+
+        Returns
+        -------
+        island_map: str
+        ini_pop: list
+        """
+        island_map = """OOOO
+                        OJSO
+                        OOOO"""
+        ini_pop = [{'loc': (1, 1),
+                    'pop': [{'species': 'Herbivore', 'age': 5,
+                             'weight': 20.0} for _ in range(20)]}]
+        return island_map, ini_pop
+
+    def test_grid(self):
+        points = sweep.grid({('Herbivore', 'F'): [10.0, 20.0],
+                             ('J', 'f_max'): [300.0, 500.0, 800.0]})
+        assert len(points) == 6
+        assert points[0] == {'Herbivore': {'F': 10.0}, 'J': {'f_max': 300.0}}
+
+    def test_latin_hypercube(self):
+        points = sweep.latin_hypercube({('Carnivore', 'omega'): (0.0, 1.0)},
+                                       10, seed=1)
+        values = np.sort([point['Carnivore']['omega'] for point in points])
+        assert np.array_equal(np.floor(values * 10), np.arange(10))
+
+    def test_cache_key(self, gen_sweep_data):
+        island_map, ini_pop = gen_sweep_data
+        params = {'Herbivore': {'F': 10.0}}
+        key = sweep.cache_key(island_map, ini_pop, params, 1, 10)
+        assert key == sweep.cache_key(island_map.replace(' ', ''), ini_pop,
+                                      {'Herbivore': {'F': np.float64(10)}},
+                                      1, 10)
+        assert key != sweep.cache_key(island_map, ini_pop, params, 2, 10)
+        assert key != sweep.cache_key(island_map, ini_pop, params, 1, 11)
+        assert key != sweep.cache_key(island_map, ini_pop,
+                                      {'Herbivore': {'F': 11.0}}, 1, 10)
+
+    def test_extended_sweep_uses_cache(self, gen_sweep_data, tmpdir):
+        island_map, ini_pop = gen_sweep_data
+        space = {('Herbivore', 'omega'): [0.2, 0.6]}
+        first = sweep.run(island_map, ini_pop, sweep.grid(space), [1, 2], 3,
+                          str(tmpdir), workers=1)
+        assert first.num_computed == 4
+        assert first.counts.shape == (2, 2, 4, 2)
+
+        space[('Herbivore', 'omega')].append(0.9)
+        second = sweep.run(island_map, ini_pop, sweep.grid(space), [1, 2], 3,
+                           str(tmpdir), workers=2)
+        assert second.num_computed == 2
+        assert np.array_equal(second.counts[:2], first.counts)
+        expected = ensemble.simulate_counts(island_map, ini_pop, 2, 3,
+                                            second.points[2])
+        assert np.array_equal(second.counts[2, 1], expected)
+        assert second.mean().shape == (3, 4, 2)